@@ -54,6 +54,10 @@ export interface AppConfig {
   whisper: {
     serverUrl: string;
     serverPort: number;
+    // 与faster-whisper引擎共享的上传目录；设置后按路径提交文件，不再重新上传
+    sharedInputDir?: string;
+    // faster-whisper引擎的Unix域套接字路径（同机部署时使用）
+    socketPath?: string;
     model: string;
     modelSize: string;
     timeout: {
@@ -141,6 +145,8 @@ export const appConfig: AppConfig = {
   whisper: {
     serverUrl: process.env.WHISPER_SERVER_URL || 'http://localhost:8178',
     serverPort: parseInt(process.env.WHISPER_SERVER_PORT || '8178', 10),
+    sharedInputDir: process.env.WHISPER_SHARED_INPUT_DIR || undefined,
+    socketPath: process.env.WHISPER_SOCKET_PATH || undefined,
     model: process.env.WHISPER_MODEL || 'small',
     modelSize:
       process.env.WHISPER_MODEL_SIZE || process.env.WHISPER_MODEL || 'small',
@@ -1,6 +1,7 @@
 import { Router, type Request, type Response } from 'express';
 import type { IRouter } from 'express';
-import { readFile } from 'fs/promises';
+import { readFile, stat } from 'fs/promises';
+import { isAbsolute, relative, resolve as resolvePath } from 'path';
 import FormData from 'form-data';
 import axios from 'axios';
 import { MeetingManager } from '../services/meeting.js';
@@ -67,6 +68,20 @@ function formatAudioDuration(seconds: number): string {
   }
 }
 
+// 音频文件位于与faster-whisper引擎共享的目录中时返回其绝对路径，否则返回undefined
+function resolveSharedInputPath(filePath: string): string | undefined {
+  const sharedDir = appConfig.whisper.sharedInputDir;
+  if (!sharedDir) {
+    return undefined;
+  }
+  const absolutePath = resolvePath(filePath);
+  const relativePath = relative(resolvePath(sharedDir), absolutePath);
+  if (!relativePath || relativePath.startsWith('..') || isAbsolute(relativePath)) {
+    return undefined;
+  }
+  return absolutePath;
+}
+
 const router: IRouter = Router();
 let meetingManager: MeetingManager;
 let transcriptionRouter: TranscriptionRouter;
@@ -378,8 +393,8 @@ async function processTranscriptionInBackground(
       progress: 5,
     });
 
-    // 读取音频文件
-    const audioBuffer = await readFile(audioFilePath);
+    // 文件大小用于估算超时；文件内容只在需要发送给引擎时才读取
+    const { size: audioSize } = await stat(audioFilePath);
     
     // 获取当前选择的引擎
     const currentEngine = await getCurrentEngine();
@@ -390,7 +405,7 @@ async function processTranscriptionInBackground(
       console.log('🌐 使用OpenAI引擎进行转录...');
       
       const result = await transcriptionRouter.transcribe(
-        audioBuffer,
+        await readFile(audioFilePath),
         filename,
         {
           ...options,
@@ -422,10 +437,16 @@ async function processTranscriptionInBackground(
     
     console.log(`🔧 使用服务器: ${whisperServerUrl}`);
     
+    // 同机部署的faster-whisper引擎可通过Unix域套接字访问（URL中的主机和端口被忽略）
+    const engineRequestOptions =
+      currentEngine === 'faster-whisper' && appConfig.whisper.socketPath
+        ? { socketPath: appConfig.whisper.socketPath }
+        : {};
+    
     // 计算音频时长估算超时时间
-    const getTranscriptionTimeout = (audioBuffer: Buffer): number => {
+    const getTranscriptionTimeout = (fileSizeBytes: number): number => {
       // 基于文件大小估算音频时长（粗略估计）
-      const fileSizeMB = audioBuffer.length / (1024 * 1024);
+      const fileSizeMB = fileSizeBytes / (1024 * 1024);
       const estimatedMinutes = Math.max(fileSizeMB / 2, 1); // 假设每2MB约1分钟音频
       
       // 转录时间通常是音频时长的0.5-1倍（取决于模型和硬件）
@@ -435,18 +456,27 @@ async function processTranscriptionInBackground(
       return Math.min(transcriptionMinutes * 60, 360 * 60); // 秒数
     };
     
-    const timeoutSeconds = getTranscriptionTimeout(audioBuffer);
-    const maxAttempts = timeoutSeconds; // 每秒轮询一次
+    const timeoutSeconds = getTranscriptionTimeout(audioSize);
+    let maxAttempts = timeoutSeconds; // 每秒轮询一次，引擎上报ETA后按实际进度延长
     
-    console.log(`📊 预计转录时间: ${Math.round(timeoutSeconds/60)} 分钟，文件大小: ${Math.round(audioBuffer.length/(1024*1024))}MB`);
+    console.log(`📊 预计转录时间: ${Math.round(timeoutSeconds/60)} 分钟，文件大小: ${Math.round(audioSize/(1024*1024))}MB`);
     
     try {
       // 发送转录请求到Whisper服务
       const formData = new FormData();
-      formData.append('file', audioBuffer, {
-        filename: filename,
-        contentType: 'audio/wav',
-      });
+      // faster-whisper与API共享文件系统时只提交路径，由引擎原地读取，不再重新上传文件
+      const sharedInputPath =
+        currentEngine === 'faster-whisper' ? resolveSharedInputPath(audioFilePath) : undefined;
+      if (sharedInputPath) {
+        formData.append('path', sharedInputPath);
+        formData.append('filename', filename);
+        console.log(`📂 使用共享目录中的文件: ${sharedInputPath}`);
+      } else {
+        formData.append('file', await readFile(audioFilePath), {
+          filename: filename,
+          contentType: 'audio/wav',
+        });
+      }
       
       // 处理混合语言模式
       if (options.language === 'mixed') {
@@ -479,6 +509,7 @@ async function processTranscriptionInBackground(
 
       const response = await axios.post(`${whisperServerUrl}/inference`, formData, {
         headers: formData.getHeaders(),
+        ...engineRequestOptions,
       });
 
       if (!response.data) {
@@ -496,7 +527,7 @@ async function processTranscriptionInBackground(
         
         while (attempts < maxAttempts) {
           try {
-            const statusResponse = await axios.get(`${whisperServerUrl}/status/${whisperTaskId}`);
+            const statusResponse = await axios.get(`${whisperServerUrl}/status/${whisperTaskId}`, engineRequestOptions);
             
             if (statusResponse.data) {
               const status = statusResponse.data;
@@ -509,6 +540,11 @@ async function processTranscriptionInBackground(
                 });
                 console.log(`📊 任务 ${taskId} 进度更新: ${status.progress}%`);
               }
+
+              // 引擎按实际解码速度给出剩余时间，长音频不再受文件大小估算的超时限制
+              if (typeof status.eta_seconds === 'number') {
+                maxAttempts = Math.max(maxAttempts, attempts + Math.ceil(status.eta_seconds * 1.5) + 60);
+              }
               
               if (status.status === 'completed' && status.result) {
                 // 转录完成，处理结果
@@ -579,6 +615,16 @@ async function processTranscriptionInBackground(
                 return;
               }
               
+              if (status.status === 'cancelled') {
+                // 引擎端任务已被取消（DELETE /tasks/<id>）：结束轮询，也不改用备用引擎重新转录
+                await meetingManager.updateTranscriptionTask(taskId, {
+                  status: 'cancelled',
+                  error: 'Whisper转录任务已被取消',
+                });
+                console.log(`🛑 转录任务 ${taskId} 已在引擎端取消`);
+                return;
+              }
+
               if (status.status === 'error') {
                 throw new Error(`Whisper转录失败: ${status.error || '未知错误'}`);
               }
@@ -678,7 +724,7 @@ async function processTranscriptionInBackground(
       
       // 使用备用转录引擎
       const result = await transcriptionRouter.transcribe(
-        audioBuffer,
+        await readFile(audioFilePath),
         filename,
         {
           ...options,
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时转录延迟基准
+按实时速度把WAV文件回放到 /live WebSocket，统计从语音结束到收到文字的延迟。
+
+用法:
+    python bench_live_latency.py meeting.wav --url ws://127.0.0.1:8178/live --language zh
+
+非16kHz单声道16位的音频会先用ffmpeg转换。
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import threading
+import time
+import wave
+
+from simple_websocket import Client, ConnectionClosed
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.1
+
+
+def load_pcm16(path: str) -> bytes:
+    """读取为16kHz单声道16位PCM"""
+    try:
+        with wave.open(path, 'rb') as wav:
+            if wav.getframerate() == SAMPLE_RATE and wav.getnchannels() == 1 and wav.getsampwidth() == 2:
+                return wav.readframes(wav.getnframes())
+    except wave.Error:
+        pass
+    return subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', path, '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1'],
+        check=True, capture_output=True
+    ).stdout
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a WAV file against /live in real time and measure latency.")
+    parser.add_argument('audio', help='Audio file to replay.')
+    parser.add_argument('--url', default='ws://127.0.0.1:8178/live', help='Live transcription WebSocket URL.')
+    parser.add_argument('--language', default='auto', help='Language passed to the engine.')
+    parser.add_argument('--min-chunk', type=float, default=1.0, help='Seconds of new audio between decodes.')
+    parser.add_argument('--target', type=float, default=2.0, help='Latency target in seconds.')
+    args = parser.parse_args()
+
+    pcm = load_pcm16(args.audio)
+    duration = len(pcm) / 2 / SAMPLE_RATE
+    ws = Client.connect(f"{args.url}?language={args.language}&min_chunk={args.min_chunk}")
+    frame_bytes = int(FRAME_SECONDS * SAMPLE_RATE) * 2
+    started = time.time()
+
+    def send_audio():
+        # 第n帧在 started + n*FRAME_SECONDS 时发送，模拟麦克风实时输入
+        for index, offset in enumerate(range(0, len(pcm), frame_bytes)):
+            delay = started + index * FRAME_SECONDS - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            ws.send(pcm[offset:offset + frame_bytes])
+        ws.send(json.dumps({"type": "end"}))
+
+    sender = threading.Thread(target=send_audio, daemon=True)
+    sender.start()
+
+    latencies = {"partial": [], "final": []}
+    first_text_latency = None
+    final_text = []
+    try:
+        while True:
+            message = json.loads(ws.receive())
+            received = time.time() - started
+            if message["type"] in latencies:
+                # 该段语音结束的时刻已按实时速度发送，差值即语音到文字的延迟
+                latency = received - message["end"]
+                latencies[message["type"]].append(latency)
+                if first_text_latency is None:
+                    first_text_latency = latency
+                if message["type"] == "final":
+                    final_text.append(message["text"])
+            elif message["type"] in ("done", "error"):
+                if message["type"] == "error":
+                    print(f"engine error: {message.get('error')}")
+                break
+    except ConnectionClosed:
+        pass
+    finally:
+        try:
+            ws.close()
+        except ConnectionClosed:
+            pass
+
+    print(f"audio duration: {duration:.1f}s, wall time: {time.time() - started:.1f}s")
+    for kind, values in latencies.items():
+        if values:
+            print(f"{kind:>7}: n={len(values):4d}  p50={statistics.median(values):.2f}s  "
+                  f"p90={percentile(values, 0.9):.2f}s  max={max(values):.2f}s")
+    if first_text_latency is not None:
+        print(f"first text latency: {first_text_latency:.2f}s")
+    p90_partial = percentile(latencies["partial"] or latencies["final"], 0.9)
+    print(f"target {args.target:.1f}s: {'PASS' if p90_partial <= args.target else 'FAIL'} (p90 partial)")
+    print(f"transcript: {''.join(final_text)[:200]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+繁简转换微基准
+对一份2小时中文转录（默认合成，也可用 --transcript 指定 /status 结果中的JSON）比较:
+  - legacy:      OpenCC 转换拼接后的全文，再逐片段转换一次（旧路径，每个字符转换两次）
+  - opencc:      OpenCC 逐片段和逐词转换一次
+  - trie (cold): ChineseConverter 逐片段和逐词转换，缓存为空
+  - trie (warm): 同一转换器再转换一遍，全部命中短句缓存
+并统计与 OpenCC 结果不一致的片段数。
+
+用法:
+    python bench_zh_convert.py
+    python bench_zh_convert.py --hours 2 --unique      # 每个片段附加随机字，降低缓存命中
+    python bench_zh_convert.py --transcript result.json
+"""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from zh_convert import ChineseConverter  # noqa: E402
+
+# 会议转录中常见的短句（繁体，夹杂少量简体和英文）
+CLAUSES = [
+    "好的", "對", "然後呢", "我們先看一下這個問題", "這個數據是上個月的", "大家還有什麼意見嗎",
+    "我覺得這個方案可以", "但是預算方面還需要再確認", "財務那邊說下週會給結果", "那我們就這樣決定",
+    "技術團隊這邊進度有點延遲", "主要是伺服器遷移的問題", "資料庫的備份已經完成了", "測試環境下週一上線",
+    "客戶反饋說介面不太好用", "我們需要重新設計一下", "這個需求的優先級比較高", "會議記錄我會發給大家",
+    "請各部門在週五前提交報告", "關於人員招聘的事情", "目前還缺兩個後端開發", "市場部準備了新的推廣計劃",
+    "下個季度的目標是用戶數翻倍", "這需要和銷售團隊一起討論", "產品發佈會定在十月中旬", "場地已經預訂好了",
+    "還有一個問題想請教一下", "系統的穩定性怎麼樣", "上週出現了兩次故障", "都已經修復了", "原因是記憶體洩漏",
+    "我們加了監控和告警", "以後會及時發現", "這個API的回應時間太長", "平均大概三百毫秒", "目標是降到一百以內",
+    "可以考慮加快取", "或者優化資料庫查詢", "我來負責這部分", "有問題隨時聯繫我", "那今天就到這裡", "謝謝大家",
+    "OK", "沒問題", "嗯", "這個我同意", "我們再看看", "好", "明白了", "這樣的話時間來得及嗎",
+]
+# 用于 --unique 的繁体常用字
+UNIQUE_CHARS = "這個們來說時會為國與發經後對學開關點現動體當實進種長應總讓義電話現將認術問題資處決"
+
+
+def synthetic_transcript(hours: float, unique: bool, seed: int = 0):
+    """按约3.5秒一个片段生成转录，每个片段2-4个短句，词级时间戳每两个字一个词"""
+    rng = random.Random(seed)
+    segments = []
+    position = 0.0
+    while position < hours * 3600:
+        text = "，".join(rng.choice(CLAUSES) for _ in range(rng.randint(2, 4)))
+        if unique:
+            text += "".join(rng.choice(UNIQUE_CHARS) for _ in range(4))
+        duration = rng.uniform(2.5, 4.5)
+        words = []
+        step = duration / max(1, len(text) // 2 + 1)
+        for i in range(0, len(text), 2):
+            start = position + (i // 2) * step
+            words.append({"word": text[i:i + 2], "start": round(start, 3), "end": round(start + step, 3)})
+        segments.append({"start": round(position, 3), "end": round(position + duration, 3), "text": text,
+                         "words": words})
+        position += duration
+    return segments
+
+
+def load_transcript(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data = data.get('result', data)
+    return data['segments']
+
+
+def convert_segments(convert, segments, words: bool = True):
+    for segment in segments:
+        segment["text"] = convert(segment["text"])
+        if words:
+            for word in segment.get("words") or ():
+                word["word"] = convert(word["word"])
+    return " ".join(segment["text"] for segment in segments)
+
+
+def timed(func, segments):
+    segments = copy.deepcopy(segments)
+    gc.collect()
+    started = time.perf_counter()
+    func(segments)
+    return time.perf_counter() - started, segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Traditional-to-Simplified conversion of a transcript.")
+    parser.add_argument('--hours', type=float, default=2.0, help='Length of the synthetic transcript.')
+    parser.add_argument('--unique', action='store_true', help='Append random characters to every segment.')
+    parser.add_argument('--transcript', help='JSON result (with "segments") to use instead of synthetic text.')
+    args = parser.parse_args()
+
+    import opencc
+    cc = opencc.OpenCC('t2s')
+    segments = load_transcript(args.transcript) if args.transcript else synthetic_transcript(args.hours, args.unique)
+    characters = sum(len(segment["text"]) for segment in segments)
+    print(f"transcript: {len(segments)} segments, {characters} characters")
+
+    started = time.perf_counter()
+    converter = ChineseConverter.from_opencc_package()
+    print(f"trie build: {time.perf_counter() - started:.3f}s")
+
+    def legacy(segs):
+        cc.convert(" ".join(segment["text"] for segment in segs))
+        convert_segments(cc.convert, segs, words=False)
+
+    results = [
+        ("legacy", *timed(legacy, segments)),
+        ("opencc", *timed(lambda segs: convert_segments(cc.convert, segs), segments)),
+        ("trie (cold)", *timed(lambda segs: convert_segments(converter.convert, segs), segments)),
+        ("trie (warm)", *timed(lambda segs: convert_segments(converter.convert, segs), segments)),
+    ]
+    baseline = results[0][1]
+    for name, seconds, _ in results:
+        print(f"{name:12s} {seconds * 1000:9.1f} ms  {baseline / seconds:6.1f}x")
+    print(f"cache: {converter.cache_info()}")
+
+    reference = results[1][2]
+    mismatched = [(a["text"], b["text"]) for a, b in zip(reference, results[2][2]) if a["text"] != b["text"]]
+    print(f"segments differing from OpenCC: {len(mismatched)} / {len(segments)}")
+    for opencc_text, trie_text in mismatched[:5]:
+        print(f"  opencc: {opencc_text}\n  trie:   {trie_text}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转录任务取消检查
+用桩模型（逐个慢速产出片段，并记录已被拉取的片段数）经 /inference 提交一段合成录音，
+在第一个30秒窗口的中途 DELETE /tasks/<task_id>，断言：
+- 取消请求之后最多再从模型拉取一个片段（片段预读），不会开始下一个窗口；
+- 模型的片段生成器被关闭，任务状态变为 cancelled；
+- 工作线程被释放，调度器中没有忙碌的工作线程。
+不满足时以非零状态退出。不需要 faster-whisper。
+
+用法:
+    python check_cancel.py
+    python check_cancel.py --segment-seconds 0.5 --cancel-after 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+import app  # noqa: E402
+from streaming import SAMPLE_RATE, WINDOW_SECONDS  # noqa: E402
+
+StubSegment = namedtuple('StubSegment', ['start', 'end', 'text', 'words'])
+StubInfo = namedtuple('StubInfo', ['language', 'language_probability', 'duration'])
+
+
+class StubModel:
+    """每个窗口均匀产出若干片段，每个片段之前等待一段时间；记录被拉取的片段数和生成器是否被关闭"""
+
+    def __init__(self, segments_per_window: int, segment_seconds: float):
+        self.segments_per_window = segments_per_window
+        self.segment_seconds = segment_seconds
+        self.lock = threading.Lock()
+        self.windows = 0
+        self.pulled = 0
+        self.closed = 0
+
+    def transcribe(self, audio, **kwargs):
+        duration = len(audio) / SAMPLE_RATE
+        with self.lock:
+            self.windows += 1
+
+        def generate():
+            step = duration / self.segments_per_window
+            try:
+                for i in range(self.segments_per_window):
+                    time.sleep(self.segment_seconds)
+                    with self.lock:
+                        self.pulled += 1
+                    yield StubSegment(i * step, (i + 1) * step, f' stub {i}', None)
+            finally:
+                with self.lock:
+                    self.closed += 1
+
+        return generate(), StubInfo('en', 1.0, duration)
+
+
+def make_recording(path: str, seconds: float):
+    """用ffmpeg生成正弦波WAV录音"""
+    source = f"sine=frequency=440:sample_rate={SAMPLE_RATE}:duration={seconds}"
+    subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 'lavfi', '-i', source, '-ac', '1', path],
+                   check=True)
+
+
+def wait_for(condition, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assert that cancelling a running task stops decoding within one segment.")
+    parser.add_argument('--seconds', type=float, default=WINDOW_SECONDS * 3, help='Length of the synthetic recording.')
+    parser.add_argument('--segments-per-window', type=int, default=10, help='Segments the stub model yields per window.')
+    parser.add_argument('--segment-seconds', type=float, default=0.2, help='Time the stub model takes per segment.')
+    parser.add_argument('--cancel-after', type=int, default=3, help='Cancel once this many segments have been pulled.')
+    args = parser.parse_args()
+    if not 0 < args.cancel_after < args.segments_per_window - 1:
+        parser.error('--cancel-after must leave at least two segments in the first window')
+
+    stub = StubModel(args.segments_per_window, args.segment_seconds)
+    with tempfile.TemporaryDirectory(prefix='check_cancel_') as work_dir:
+        app.args = app.parser.parse_args([
+            '--task-store', 'memory', '--workers', '1', '--batch-size', '1', '--parallel-processes', '0',
+            '--cache-max-mb', '0', '--results-dir', os.path.join(work_dir, 'results'),
+            '--audio-dir', os.path.join(work_dir, 'audio'),
+        ])
+        app.load_whisper_model = lambda model_path: stub
+        app.init_services()
+        app.model_ready.wait()
+
+        recording = os.path.join(work_dir, 'recording.wav')
+        make_recording(recording, args.seconds)
+        client = app.app.test_client()
+        with open(recording, 'rb') as f:
+            task_id = client.post('/inference', data={'file': (f, 'recording.wav')}).get_json()['task_id']
+
+        if not wait_for(lambda: stub.pulled >= args.cancel_after, 30 + args.segment_seconds * args.cancel_after):
+            print(f"FAIL: stub model was never reached (status: {client.get(f'/status/{task_id}').get_json()})")
+            sys.exit(1)
+        pulled_at_cancel = stub.pulled
+        response = client.delete(f'/tasks/{task_id}')
+        print(f"DELETE /tasks/{task_id}: {response.status_code} {response.get_json()} after {pulled_at_cancel} segments")
+
+        timeout = args.segment_seconds * 3 + 5
+        cancelled = wait_for(lambda: client.get(f'/status/{task_id}').get_json()['status'] == 'cancelled', timeout)
+        freed = wait_for(lambda: app.scheduler.stats()['busy_workers'] == 0, timeout)
+        # 确认取消之后模型没有在后台继续被拉取
+        time.sleep(args.segment_seconds * 2)
+        extra = stub.pulled - pulled_at_cancel
+        status = client.get(f'/status/{task_id}').get_json()
+
+    checks = [
+        (f"task status is cancelled ({status['status']})", cancelled),
+        (f"at most one more segment pulled after cancel ({extra})", extra <= 1),
+        (f"no new window started ({stub.windows} window(s))", stub.windows == 1),
+        (f"segment generator closed ({stub.closed})", stub.closed == stub.windows),
+        (f"worker freed (busy_workers={app.scheduler.stats()['busy_workers']})", freed),
+    ]
+    for description, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {description}")
+    if not all(ok for _, ok in checks):
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
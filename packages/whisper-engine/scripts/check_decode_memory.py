@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长音频解码内存检查
+生成合成的长录音（默认3小时），经 FfmpegPcmDecoder + transcribe_pcm_windows 完整走一遍，
+断言进程峰值常驻内存的增长不超过上限，超出时以非零状态退出。
+
+用法:
+    python check_decode_memory.py --hours 3 --limit-mb 200
+    python check_decode_memory.py --model small   # 使用真实模型（耗时很长）
+
+默认使用只返回一个片段的桩模型，只测量解码和窗口拼接的内存。
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from streaming import FfmpegPcmDecoder, SAMPLE_RATE, transcribe_pcm_windows  # noqa: E402
+
+StubSegment = namedtuple('StubSegment', ['start', 'end', 'text', 'words'])
+StubInfo = namedtuple('StubInfo', ['language', 'duration'])
+
+
+class StubModel:
+    """每个窗口返回覆盖整段音频的一个片段"""
+
+    def transcribe(self, audio, **kwargs):
+        duration = len(audio) / SAMPLE_RATE
+        return iter([StubSegment(0.0, duration, ' stub', None)]), StubInfo('en', duration)
+
+
+def peak_rss_mb() -> float:
+    # Linux上 ru_maxrss 单位为KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_recording(path: str, seconds: float):
+    """用ffmpeg生成带间歇静音的AAC录音"""
+    source = f"sine=frequency=440:sample_rate={SAMPLE_RATE}:duration={seconds}"
+    subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 'lavfi', '-i', source,
+         '-af', 'volume=enable=\'lt(mod(t,20),2)\':volume=0', '-ac', '1', '-c:a', 'aac', '-b:a', '24k', path],
+        check=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assert bounded peak RSS when decoding a long recording.")
+    parser.add_argument('--hours', type=float, default=3.0, help='Length of the synthetic recording.')
+    parser.add_argument('--limit-mb', type=float, default=200.0, help='Maximum allowed peak RSS growth in MB.')
+    parser.add_argument('--model', help='faster-whisper model to use instead of the stub.')
+    args = parser.parse_args()
+
+    if args.model:
+        from faster_whisper import WhisperModel
+        model = WhisperModel(args.model, device="cpu", compute_type="int8")
+    else:
+        model = StubModel()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.m4a')
+        seconds = args.hours * 3600
+        print(f"generating {args.hours:g}h recording...")
+        make_recording(path, seconds)
+
+        baseline = peak_rss_mb()
+        started = time.time()
+        reader = FfmpegPcmDecoder(source=path)
+        try:
+            duration = reader.duration()
+            segments = sum(1 for _ in transcribe_pcm_windows(model, reader.iter_pcm()))
+        finally:
+            reader.close()
+        growth = peak_rss_mb() - baseline
+
+    print(f"container duration: {duration}, decoded: {reader.samples_decoded / SAMPLE_RATE:.0f}s, "
+          f"segments: {segments}, wall: {time.time() - started:.1f}s")
+    # 整段解码为float32需要的内存，作为对比
+    print(f"peak RSS growth: {growth:.1f} MB (full buffer would be {seconds * SAMPLE_RATE * 4 / 2**20:.0f} MB)")
+    if growth > args.limit_mb:
+        print(f"FAIL: exceeds limit of {args.limit_mb:g} MB")
+        sys.exit(1)
+    print("PASS")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/status 片段切片检查
+在内存任务存储中放入一个已完成的合成任务（不加载模型），对 since、offset/limit 与
+format=segments|columnar|msgpack 的各种组合请求 /status，断言返回的片段与直接切片的结果一致，
+不一致时以非零状态退出。
+
+用法:
+    python check_status_slicing.py
+    python check_status_slicing.py --segments 500 --words
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+import app  # noqa: E402
+from columnar import from_columnar, to_columnar  # noqa: E402
+from result_payloads import PayloadCache  # noqa: E402
+from task_store import MemoryTaskStore  # noqa: E402
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def make_result(count: int, with_words: bool):
+    """毫秒精度的合成结果，文本含非BMP字符以覆盖偏移量换算"""
+    segments = []
+    for i in range(count):
+        segment = {"start": i * 2.0, "end": i * 2.0 + 1.5, "text": f" 片段{i} 🎙"}
+        if with_words:
+            segment["words"] = [
+                {"word": f" 片段{i}", "start": i * 2.0, "end": i * 2.0 + 0.7, "probability": 0.9},
+                {"word": " 🎙", "start": i * 2.0 + 0.7, "end": i * 2.0 + 1.5, "probability": 0.75},
+            ]
+        segments.append(segment)
+    return {
+        "text": " ".join(segment["text"] for segment in segments),
+        "language": "zh",
+        "duration": count * 2.0,
+        "segments": segments,
+    }
+
+
+def fetch(client, task_id: str, query: str):
+    response = client.get(f"/status/{task_id}?{query}")
+    assert response.status_code == 200, (query, response.status_code, response.get_data(as_text=True))
+    if response.mimetype == 'application/json':
+        return response.get_json()
+    return msgpack.unpackb(response.get_data(), raw=False)
+
+
+def returned_segments(status, result_format: str):
+    """响应中的片段：片段格式的 since 在顶层，其余情况在 result 中"""
+    if result_format == 'segments' and 'segments' in status:
+        return status['segments']
+    result = status['result']
+    if result_format != 'segments':
+        assert result.get('format') == 'columnar', f"result is not columnar: {sorted(result)}"
+        assert result['segments']['count'] == len(from_columnar(result)['segments'])
+    return from_columnar(result)['segments']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check /status since and offset/limit slicing for every format.")
+    parser.add_argument('--segments', type=int, default=50, help='Number of segments in the synthetic result.')
+    parser.add_argument('--words', action='store_true', help='Include word timestamps.')
+    args = parser.parse_args()
+
+    result = make_result(args.segments, args.words)
+    expected_all = from_columnar(to_columnar(result))['segments']
+    app.processing_status = MemoryTaskStore()
+    app.status_payloads = PayloadCache(16 * 2**20)
+    for stored_format in ('segments', 'columnar'):
+        app.processing_status[f"task_{stored_format}"] = {
+            "task_id": f"task_{stored_format}",
+            "status": "completed",
+            "progress": 100,
+            "result_format": stored_format,
+            "result": to_columnar(result) if stored_format == 'columnar' else result,
+        }
+
+    formats = ['segments', 'columnar'] + (['msgpack'] if msgpack is not None and app.HAS_MSGPACK else [])
+    middle = args.segments // 2
+    failures = 0
+    client = app.app.test_client()
+    for task_id in ("task_segments", "task_columnar"):
+        for result_format in formats:
+            cases = [
+                ("since=0", expected_all),
+                (f"since={middle}", expected_all[middle:]),
+                (f"since={args.segments}", []),
+                (f"offset={middle}&limit=5", expected_all[middle:middle + 5]),
+            ]
+            for query, expected in cases:
+                status = fetch(client, task_id, f"{query}&format={result_format}")
+                segments = returned_segments(status, result_format)
+                text = (status['result']['text'] if result_format != 'segments' else
+                        " ".join(segment['text'] for segment in segments))
+                ok = (segments == expected and text == " ".join(segment['text'] for segment in expected))
+                if query.startswith('since'):
+                    ok = ok and status.get('next_since') == args.segments
+                print(f"{'ok  ' if ok else 'FAIL'} {task_id} format={result_format} {query}: {len(segments)} segments")
+                failures += not ok
+
+    if failures:
+        print(f"FAIL: {failures} case(s) returned the wrong segments")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
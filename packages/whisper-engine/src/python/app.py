@@ -29,27 +29,71 @@ except locale.Error:
         except locale.Error:
             pass
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from faster_whisper import WhisperModel
-import tempfile
 import os
 import logging
 import threading
 import time
 import uuid
-import subprocess
 import json
 from datetime import datetime, timedelta
 import argparse
-from opencc import OpenCC
+import itertools
+from array import array
 from typing import Dict, Any, Optional
 
+from scheduler import (CANCELLED, DEFAULT_PRIORITY, DEFERRED, PRIORITY_OFFSETS, JobScheduler, QueueFullError,
+                       SchedulerUnavailableError)
+from parallel import ParallelTranscriber, detect_language
+from batching import MicroBatcher, WINDOW_SECONDS as BATCH_WINDOW_SECONDS
+from task_events import TaskEvents
+from models import ModelRegistry, UnknownModelError, model_cost_factor
+from task_store import TERMINAL_STATUSES, create_task_store
+from result_store import ResultStore
+from result_cache import ResultCache, cache_key, inflight_key
+from result_payloads import MIN_COMPRESS_BYTES, Payload, PayloadCache, iter_chunks
+from pcm import DecodedAudio, decode_file, iter_pcm_chunks
+from audio_store import AudioNotFoundError, AudioStore
+from uploads import InputPathError, SpoolingRequest, file_sha256, resolve_input_path
+from streaming import (SAMPLE_RATE, FfmpegPcmDecoder, peek_pcm, probe_duration, segment_to_dict,
+                       transcribe_pcm_windows)
+from live import LiveTranscriber
+from zh_convert import ChineseConverter
+from columnar import from_columnar, json_default, to_columnar
+from clips import (ClipRangeError, clip_ranges, ffmpeg_range_args, parse_ranges, requested_position,
+                   requested_seconds, slice_samples, transcribe_ranges)
+
 # ----------------- Argument Parsing -----------------
 parser = argparse.ArgumentParser(description="Flask server for faster-whisper transcription.")
 parser.add_argument('--port', type=int, default=8178, help='Port to run the server on.')
-parser.add_argument('--model-path', type=str, default='small', help='Path to the faster-whisper model.')
-args = parser.parse_args()
+parser.add_argument('--unix-socket', type=str, default=os.environ.get('WHISPER_UNIX_SOCKET', ''), help='Also serve the API on this Unix domain socket path.')
+parser.add_argument('--model-path', type=str, default=os.environ.get('WHISPER_MODEL_PATH', 'small'), help='Path to the faster-whisper model.')
+parser.add_argument('--models', type=str, default=os.environ.get('WHISPER_MODELS', ''), help='Comma-separated extra models selectable per request via the "model" parameter.')
+parser.add_argument('--model-memory-mb', type=float, default=float(os.environ.get('WHISPER_MODEL_MEMORY_MB', 0)), help='Resident memory budget for loaded models; least recently used models are unloaded above it (0 = unlimited).')
+parser.add_argument('--workers', type=int, default=int(os.environ.get('WHISPER_WORKERS', 1)), help='Number of concurrent inference workers.')
+parser.add_argument('--max-queue', type=int, default=int(os.environ.get('WHISPER_MAX_QUEUE', 16)), help='Maximum number of jobs waiting in the queue.')
+parser.add_argument('--queue-aging-rate', type=float, default=float(os.environ.get('WHISPER_QUEUE_AGING_RATE', 1.0)), help='Queue priority gained per second of waiting, in estimated audio seconds (prevents starvation of long and batch jobs).')
+parser.add_argument('--task-store', choices=['sqlite', 'memory'], default=os.environ.get('WHISPER_TASK_STORE', 'sqlite'), help='Task status backend (memory is for development).')
+parser.add_argument('--task-db', type=str, default=os.environ.get('WHISPER_TASK_DB', '/tmp/whisper_tasks.db'), help='SQLite database path for the sqlite task store.')
+parser.add_argument('--task-retention-hours', type=float, default=float(os.environ.get('WHISPER_TASK_RETENTION_HOURS', 24)), help='Hours to keep finished tasks before expiry.')
+parser.add_argument('--results-dir', type=str, default=os.environ.get('WHISPER_RESULTS_DIR', '/tmp/whisper_results'), help='Directory where results of finished tasks are stored compressed, outside process memory.')
+parser.add_argument('--results-hot-set', type=int, default=int(os.environ.get('WHISPER_RESULTS_HOT_SET', 8)), help='Number of recently read finished results kept in memory.')
+parser.add_argument('--cpu-threads', type=int, default=int(os.environ.get('WHISPER_CPU_THREADS', 0)), help='CPU threads per worker (0 = cores / workers).')
+parser.add_argument('--cache-dir', type=str, default=os.environ.get('WHISPER_CACHE_DIR', '/tmp/whisper_result_cache'), help='Directory for cached transcription results.')
+parser.add_argument('--cache-max-mb', type=float, default=float(os.environ.get('WHISPER_CACHE_MAX_MB', 512)), help='Size cap of the result cache; least recently used results are evicted (0 disables caching).')
+parser.add_argument('--status-cache-mb', type=float, default=float(os.environ.get('WHISPER_STATUS_CACHE_MB', 64)), help='Memory cap for serialised /status responses of finished tasks (0 disables).')
+parser.add_argument('--input-dirs', type=str, default=os.environ.get('WHISPER_INPUT_DIRS', ''), help='Comma-separated directories whose files /inference may transcribe in place via the "path" field (empty disables).')
+parser.add_argument('--audio-dir', type=str, default=os.environ.get('WHISPER_AUDIO_DIR', '/tmp/whisper_audio'), help='Directory for audio uploaded via POST /audio and its decoded PCM.')
+parser.add_argument('--audio-ttl-minutes', type=float, default=float(os.environ.get('WHISPER_AUDIO_TTL_MINUTES', 60)), help='Minutes an uploaded audio_id stays available after its last use.')
+parser.add_argument('--batch-size', type=int, default=int(os.environ.get('WHISPER_BATCH_SIZE', 8)), help='Maximum number of short clips decoded together in one batch (1 disables batching).')
+parser.add_argument('--parallel-processes', type=int, default=int(os.environ.get('WHISPER_PARALLEL_PROCESSES', 0)), help='Worker processes for long recordings (0 disables parallel chunked transcription).')
+parser.add_argument('--parallel-min-duration', type=float, default=float(os.environ.get('WHISPER_PARALLEL_MIN_DURATION', 600)), help='Recordings at least this many seconds long are split and transcribed in parallel.')
+parser.add_argument('--chunk-seconds', type=float, default=float(os.environ.get('WHISPER_CHUNK_SECONDS', 180)), help='Target chunk length for parallel transcription; chunks are cut at silence.')
+parser.add_argument('--batch-max-wait-ms', type=float, default=float(os.environ.get('WHISPER_BATCH_MAX_WAIT_MS', 50)), help='Milliseconds to wait for more clips before running a partial batch.')
+# 作为模块导入（测试）时不解析命令行，使用默认值或环境变量
+args = parser.parse_args(sys.argv[1:] if __name__ == '__main__' else [])
 # ----------------------------------------------------
 
 # 设置日志
@@ -60,16 +104,21 @@ logger = logging.getLogger(__name__)
 try:
     import opencc
     HAS_OPENCC = True
-    # 创建繁体转简体的转换器
-    cc = opencc.OpenCC('t2s')  # traditional to simplified
+    # 优先使用OpenCC自带词典构建的前缀树转换器（短句缓存、跳过已是简体的文本）；
+    # 安装的OpenCC实现不带文本词典时直接使用 OpenCC.convert
+    zh_converter = ChineseConverter.from_opencc_package()
+    cc = None if zh_converter is not None else opencc.OpenCC('t2s')  # traditional to simplified
     logger.info("OpenCC库已加载，支持繁简转换")
 except ImportError:
     HAS_OPENCC = False
+    zh_converter = None
     cc = None
     logger.warning("OpenCC库未安装，无法进行繁简转换。可以通过 pip install opencc-python-reimplemented 安装")
 
 def convert_to_simplified_chinese(text: str) -> str:
     """将繁体中文转换为简体中文"""
+    if zh_converter is not None:
+        return zh_converter.convert(text)
     if HAS_OPENCC and cc and text:
         try:
             return cc.convert(text)
@@ -78,86 +127,225 @@ def convert_to_simplified_chinese(text: str) -> str:
             return text
     return text
 
+def convert_segment_to_simplified(segment: Dict[str, Any]) -> Dict[str, Any]:
+    """就地转换片段文本和词级时间戳中的词；每个片段只转换一次，全文由转换后的片段拼接"""
+    segment["text"] = convert_to_simplified_chinese(segment["text"])
+    for word in segment.get("words") or ():
+        word["word"] = convert_to_simplified_chinese(word["word"])
+    return segment
+
+# 二进制(msgpack)结果编码为可选依赖
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    msgpack = None
+    HAS_MSGPACK = False
+    logger.warning("msgpack未安装，/status 不支持 format=msgpack。可以通过 pip install msgpack 安装")
+
+# 结果编码：segments 每个片段/词一个字典；columnar 并行数组（见 columnar.py）；msgpack 为列式的二进制编码
+RESULT_FORMATS = ('segments', 'columnar')
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# 词级时间戳（交叉注意力对齐）相对普通转录的额外代价
+WORD_TIMESTAMPS_COST_FACTOR = 1.3
+
+# 实时转录使用WebSocket，flask-sock为可选依赖
+try:
+    from flask_sock import Sock
+    HAS_WEBSOCKET = True
+except ImportError:
+    Sock = None
+    HAS_WEBSOCKET = False
+    logger.warning("flask-sock未安装，实时转录(/live)不可用。可以通过 pip install flask-sock 安装")
+
+class ResultJSONProvider(DefaultJSONProvider):
+    """jsonify 支持列式结果中的紧凑数组"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, array):
+            return o.tolist()
+        return DefaultJSONProvider.default(o)
+
 app = Flask(__name__)
+app.json = ResultJSONProvider(app)
+app.request_class = SpoolingRequest
 CORS(app, origins=["http://localhost:3118", "http://127.0.0.1:3118", "http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:5173", "http://127.0.0.1:5173"])
 
-# 初始化模型 - 改为使用命令行参数
-logger.info(f"Initializing Whisper model from '{args.model_path}'...")
-model = WhisperModel(args.model_path, device="cpu", compute_type="int8")
-logger.info("Whisper model initialized successfully")
+# 任务事件日志，供 /events/<task_id> SSE 推送
+task_events = TaskEvents()
+SSE_HEARTBEAT_INTERVAL = 15  # 秒
 
-# 存储处理状态 - 优化版本：减少文件I/O
-processing_status = {}
-STATUS_FILE = "/tmp/whisper_status.json"
-_status_lock = threading.Lock()
-_last_save_time = 0
-SAVE_INTERVAL = 5  # 每5秒最多保存一次
+# 运行时服务由 init_services() 创建，导入模块时不加载模型、不启动线程
+model_registry: Optional[ModelRegistry] = None
+model = None  # 默认模型，加载完成前为None
+batcher: Optional[MicroBatcher] = None
+parallel_transcriber: Optional[ParallelTranscriber] = None
+scheduler: Optional[JobScheduler] = None
+result_cache: Optional[ResultCache] = None
+status_payloads: Optional[PayloadCache] = None  # 已结束任务序列化后的 /status 响应
+audio_store: Optional[AudioStore] = None
+input_dirs: list = []  # 允许 /inference 按路径直接读取的目录（真实路径）
+processing_status = None  # 任务存储
+_status_lock = threading.RLock()
+cancelled_tasks: set = set()  # 已请求取消、尚未停止的任务，工作线程在片段边界检查
+TASK_RETENTION_SECONDS = args.task_retention_hours * 3600
+EXPIRY_CHECK_INTERVAL = 60  # 过期检查间隔（秒）
+_task_counter = itertools.count()
 
-def save_status_to_file():
-    """将状态保存到文件，防止丢失 - 优化频率"""
-    global _last_save_time
-    
-    current_time = time.time()
-    if current_time - _last_save_time < SAVE_INTERVAL:
-        return  # 跳过太频繁的保存
-    
+# 默认模型加载状态：loading / ready / failed，供 /ready 查询
+model_ready = threading.Event()
+model_state: Dict[str, Any] = {"status": "loading", "error": None, "started_at": None, "ready_at": None}
+
+def purge_expired_tasks():
+    """清理超过保留期的任务"""
     try:
-        with _status_lock:
-            # 清理过期状态（超过24小时）
-            now = datetime.now()
-            expired_tasks = []
-            for task_id, status in processing_status.items():
-                if 'created_at' in status:
-                    created_at = datetime.fromisoformat(status['created_at'])
-                    if now - created_at > timedelta(hours=24):
-                        expired_tasks.append(task_id)
-            
-            for task_id in expired_tasks:
-                del processing_status[task_id]
-                logger.info(f"Cleaned up expired task: {task_id}")
-            
-            # 保存到文件
-            with open(STATUS_FILE, 'w') as f:
-                json.dump(processing_status, f, indent=2)
-            
-            _last_save_time = current_time
-            
+        for task_id in processing_status.purge_expired(TASK_RETENTION_SECONDS):
+            task_events.discard(task_id)
+            discard_status_payloads(task_id)
+            logger.info(f"Cleaned up expired task: {task_id}")
     except Exception as e:
-        logger.warning(f"Failed to save status to file: {e}")
+        logger.warning(f"Failed to purge expired tasks: {e}")
 
-def load_status_from_file():
-    """从文件加载状态"""
+def purge_expired_audio():
+    """清理超过有效期且没有任务使用的已上传音频"""
     try:
-        if os.path.exists(STATUS_FILE):
-            with open(STATUS_FILE, 'r') as f:
-                loaded_status = json.load(f)
-                processing_status.update(loaded_status)
-                logger.info(f"Loaded {len(loaded_status)} tasks from status file")
+        for audio_id in audio_store.purge_expired():
+            logger.info(f"Cleaned up expired audio: {audio_id}")
     except Exception as e:
-        logger.warning(f"Failed to load status from file: {e}")
+        logger.warning(f"Failed to purge expired audio: {e}")
+
+def expiry_loop():
+    """后台定时清理过期任务和已上传音频，不占用请求和转录线程"""
+    while True:
+        time.sleep(EXPIRY_CHECK_INTERVAL)
+        purge_expired_tasks()
+        purge_expired_audio()
 
-# 启动时加载状态
-load_status_from_file()
+def load_whisper_model(model_path: str):
+    """创建WhisperModel，faster-whisper在此处才导入"""
+    from faster_whisper import WhisperModel
+    # 每个推理线程分到固定数量的CPU线程，避免多个任务同时抢占全部核心
+    cpu_threads = args.cpu_threads or max(1, (os.cpu_count() or 1) // max(1, args.workers))
+    logger.info(f"Initializing Whisper model from '{model_path}' ({args.workers} workers x {cpu_threads} threads)...")
+    return WhisperModel(model_path, device="cpu", compute_type="int8", cpu_threads=cpu_threads, num_workers=args.workers)
 
-def get_audio_duration(file_path):
-    """获取音频文件时长（秒）"""
+def initialize_model():
+    """后台加载默认模型，完成后启用依赖模型的批处理"""
+    global model, batcher
+    model_state["started_at"] = time.time()
     try:
-        result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-show_entries', 
-            'format=duration', '-of', 'csv=p=0', file_path
-        ], capture_output=True, text=True, timeout=10)
-        
-        if result.returncode == 0:
-            duration = float(result.stdout.strip())
-            return duration
+        loaded = model_registry.get()
+        # 跨请求微批处理：不超过30秒且不需要词级时间戳的任务合并成批次推理
+        if args.batch_size > 1:
+            batcher = MicroBatcher(loaded, max_batch_size=args.batch_size, max_wait_ms=args.batch_max_wait_ms)
+            batcher.start()
+        model = loaded
+        model_state.update(status="ready", ready_at=time.time())
+        logger.info(f"Whisper model initialized successfully ({model_state['ready_at'] - model_state['started_at']:.1f}s)")
     except Exception as e:
-        logger.warning(f"Could not get audio duration: {e}")
+        model_state.update(status="failed", error=str(e))
+        logger.error(f"Whisper模型加载失败: {e}", exc_info=True)
+    finally:
+        model_ready.set()
+
+def init_services():
+    """创建任务存储、调度器和后台线程，并在后台开始加载模型"""
+    global model_registry, parallel_transcriber, scheduler, result_cache, status_payloads, audio_store, input_dirs, processing_status, _status_lock, TASK_RETENTION_SECONDS
+    TASK_RETENTION_SECONDS = args.task_retention_hours * 3600
+    input_dirs = [os.path.realpath(d.strip()) for d in args.input_dirs.split(',') if d.strip()]
     
-    return None
+    # 存储处理状态 - 按任务持久化，进行中的任务在内存中就地更新；
+    # 已结束任务的结果压缩存放在磁盘上，内存中只保留元数据和最近读取的少量结果
+    processing_status = create_task_store(args.task_store, args.task_db,
+                                          ResultStore(args.results_dir, args.results_hot_set))
+    _status_lock = processing_status.lock
+    
+    # 转录结果缓存：相同音频内容和参数直接返回已有结果
+    if args.cache_max_mb > 0:
+        result_cache = ResultCache(args.cache_dir, int(args.cache_max_mb * 2**20))
+    
+    # 已结束任务的 /status 响应只序列化一次，轮询时直接返回字节或304
+    if args.status_cache_mb > 0:
+        status_payloads = PayloadCache(int(args.status_cache_mb * 2**20))
+    
+    # 已上传音频：一次上传和解码，多次以不同参数转录
+    audio_store = AudioStore(args.audio_dir, args.audio_ttl_minutes * 60)
+    
+    # 模型注册表：默认模型启动时加载并常驻，其余模型在首次请求时加载，超出内存预算按LRU卸载
+    model_registry = ModelRegistry(
+        load_whisper_model,
+        allowed=[name.strip() for name in args.models.split(',') if name.strip()],
+        default=args.model_path,
+        memory_budget_bytes=int(args.model_memory_mb * 2**20)
+    )
+    
+    # 转录任务调度器：固定工作线程 + 有界优先队列（优先级类别、短作业优先、等待老化）；模型加载期间提交的任务先排队
+    scheduler = JobScheduler(num_workers=args.workers, max_queue_size=args.max_queue, aging_rate=args.queue_aging_rate)
+    scheduler.start()
+    
+    # 长音频多进程并行转录：每个进程独立加载模型，按核心数平分CPU线程
+    if args.parallel_processes > 0:
+        parallel_transcriber = ParallelTranscriber(
+            args.model_path, args.parallel_processes,
+            cpu_threads=max(1, (os.cpu_count() or 1) // args.parallel_processes),
+            chunk_seconds=args.chunk_seconds
+        )
+    
+    threading.Thread(target=initialize_model, name='model-loader', daemon=True).start()
+    threading.Thread(target=expiry_loop, name='task-expiry', daemon=True).start()
+
+def estimate_job_cost(audio_seconds: Optional[float], model_name: str, word_timestamps: bool) -> Optional[float]:
+    """按音频时长、模型和词级时间戳估算任务代价（折算为 small 模型的音频秒数），时长未知时返回None"""
+    if not audio_seconds:
+        return None
+    cost = audio_seconds * model_cost_factor(model_name)
+    return cost * WORD_TIMESTAMPS_COST_FACTOR if word_timestamps else cost
+
+def is_active_task(task_id: str) -> bool:
+    """任务存在、尚未结束且未被请求取消"""
+    record = processing_status.get(task_id)
+    return record is not None and record.get('status') not in TERMINAL_STATUSES and task_id not in cancelled_tasks
+
+def attach_requester(task_id: str) -> Optional[Dict[str, Any]]:
+    """把内容相同的请求关联到进行中的任务，返回任务记录；任务已结束或已请求取消时返回None"""
+    with _status_lock:
+        record = processing_status.get(task_id)
+        if record is None or record.get('status') in TERMINAL_STATUSES or task_id in cancelled_tasks:
+            return None
+        record['requesters'] = record.get('requesters', 1) + 1
+        record['deduplicated_requests'] = record.get('deduplicated_requests', 0) + 1
+        return record
+
+def model_unavailable_response():
+    """模型未就绪时的503响应，就绪时返回None"""
+    if model_state["status"] == "ready":
+        return None
+    if model_state["status"] == "failed":
+        return jsonify({"error": f"Model failed to load: {model_state['error']}", "model_status": "failed"}), 503
+    response = jsonify({"error": "Model is still loading", "model_status": "loading"})
+    response.headers['Retry-After'] = '5'
+    return response, 503
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "ok", "model": args.model_path, "active_tasks": len(processing_status)})
+    return jsonify({"status": "ok", "model": args.model_path, "model_status": model_state["status"], "active_tasks": len(processing_status), "models": model_registry.stats(), "scheduler": scheduler.stats(),
+                    "result_cache": result_cache.stats() if result_cache else None,
+                    "status_cache": status_payloads.stats() if status_payloads else None,
+                    "result_store": processing_status.results.stats() if processing_status.results else None,
+                    "audio_store": audio_store.stats(),
+                    "batching": batcher.stats() if batcher else None})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """就绪检查：默认模型加载完成前返回503，与 /health（进程存活）分开"""
+    body = {"status": model_state["status"], "model": args.model_path}
+    if model_state["error"]:
+        body["error"] = model_state["error"]
+    if model_state["ready_at"]:
+        body["load_seconds"] = round(model_state["ready_at"] - model_state["started_at"], 2)
+    return jsonify(body), 200 if model_state["status"] == "ready" else 503
 
 @app.route('/', methods=['GET'])
 def index():
@@ -165,15 +353,62 @@ def index():
 
 @app.route('/status/<task_id>', methods=['GET'])
 def get_status(task_id):
-    """获取处理状态 - 改进版本"""
-    logger.info(f"Status request for task: {task_id}")
+    """获取处理状态 - 改进版本
     
-    if task_id in processing_status:
-        status = processing_status[task_id]
-        logger.info(f"Status for {task_id}: {status.get('status', 'unknown')}")
-        return jsonify(status)
+    支持 ?since=<n>，只返回第n个之后新增的片段，用于增量拉取部分结果；
+    支持 ?offset=<n>&limit=<m>，分页返回片段。
+    进行中任务的部分片段只在指定 since 或 offset/limit 时返回，默认响应只有进度和 segments_count，
+    只关心进度的轮询方每次下载的数据量不随已识别片段数增长。
+    响应带强ETag，If-None-Match 匹配时返回304；按 Accept-Encoding 返回 gzip/deflate 压缩的响应。
+    已结束任务的响应按请求参数只序列化一次，之后的轮询不再读取任务存储。
+    """
+    # 轮询频繁，只在调试级别记录
+    logger.debug(f"Status request for task: {task_id}")
+    
+    try:
+        variant = status_variant()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    requested_format, since, offset, limit = variant
+    if requested_format == 'msgpack' and not HAS_MSGPACK:
+        return jsonify({"error": "msgpack is not installed on the server"}), 406
+    
+    payload = status_payloads.get(task_id, variant) if status_payloads else None
+    if payload is not None:
+        return payload_response(payload)
+    
+    status = processing_status.get(task_id)
+    if status is not None:
+        logger.debug(f"Status for {task_id}: {status.get('status', 'unknown')}")
+        # 处理中的任务：记录版本未变时直接返回上次序列化的响应
+        version = status_version(status) if status.get('status') == 'processing' else None
+        if version is not None and status_payloads:
+            payload = status_payloads.get(task_id, variant, version)
+            if payload is not None:
+                return payload_response(payload)
+        if status.get('status') == 'queued':
+            # 排队中的任务附带队列位置和预计开始时间
+            status = dict(status)
+            status['queue_position'] = scheduler.position(task_id)
+            wait_seconds = scheduler.estimated_wait(task_id)
+            if wait_seconds is not None:
+                status['estimated_wait_seconds'] = round(wait_seconds, 1)
+                status['estimated_start_at'] = (datetime.now() + timedelta(seconds=wait_seconds)).isoformat()
+        result_format = requested_format or status.get('result_format', 'segments')
+        if since is None and not (offset or limit) and 'segments' in status:
+            with _status_lock:
+                status = {key: value for key, value in status.items() if key != 'segments'}
+        if since is not None:
+            status = slice_task_segments(status, since, result_format)
+        elif offset or limit:
+            status = paginate_task_segments(status, offset, limit)
+        payload = encode_task_status(status, result_format)
+        if status_payloads and (version is not None or status.get('status') in TERMINAL_STATUSES):
+            status_payloads.record_miss()
+            status_payloads.put(task_id, variant, payload, version)
+        return payload_response(payload)
     else:
-        logger.warning(f"Task not found: {task_id}. Available tasks: {list(processing_status.keys())}")
+        logger.warning(f"Task not found: {task_id}")
         return jsonify({
             "error": "Task not found", 
             "task_id": task_id,
@@ -181,14 +416,288 @@ def get_status(task_id):
             "message": "Task may have expired or was never created"
         }), 404
 
+@app.route('/events/<task_id>', methods=['GET'])
+def task_event_stream(task_id):
+    """以Server-Sent Events推送任务进度、新片段和最终结果
+    
+    支持 Last-Event-ID 请求头（或 ?last_event_id=）断点续传
+    """
+    if task_id not in processing_status:
+        return jsonify({"error": "Task not found", "task_id": task_id}), 404
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        after_id = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        after_id = 0
+    
+    def format_event(event_id: Optional[int], event: str, data: str) -> str:
+        lines = [f"event: {event}", f"data: {data}"]
+        if event_id is not None:
+            lines.insert(0, f"id: {event_id}")
+        return "\n".join(lines) + "\n\n"
+    
+    def generate():
+        yield "retry: 3000\n\n"
+        if not task_events.has_log(task_id):
+            # 没有事件日志（例如服务重启后从文件恢复的任务），先推送当前状态快照
+            status = processing_status.get(task_id, {})
+            event = status.get('status') if status.get('status') in TERMINAL_STATUSES else 'progress'
+            payload = status if event != 'progress' else progress_event_data(status)
+            yield format_event(None, event, json.dumps(payload, ensure_ascii=False, default=json_default))
+            if event != 'progress':
+                return
+        
+        cursor = after_id
+        while True:
+            events, closed = task_events.wait(task_id, cursor, SSE_HEARTBEAT_INTERVAL)
+            for event_id, event, data in events:
+                cursor = event_id
+                yield format_event(event_id, event, data)
+            if closed:
+                return
+            if not events:
+                if task_id not in processing_status:
+                    return
+                yield ": heartbeat\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/tasks', methods=['GET'])
 def list_tasks():
     """列出所有任务状态 - 调试用"""
     return jsonify({
         "total_tasks": len(processing_status),
-        "tasks": {task_id: status.get('status', 'unknown') for task_id, status in processing_status.items()}
+        "tasks": processing_status.statuses()
     })
 
+def status_version(status: Dict[str, Any]) -> tuple:
+    """处理中任务记录的版本：工作线程每次修改记录都会改变其中某个字段
+
+    排队中的任务附带按当前时间计算的预计开始时间，不按版本缓存。
+    """
+    return (status.get('status'), status.get('progress'), status.get('segments_count'), status.get('updated_at'),
+            status.get('duration'), status.get('requesters'))
+
+def status_variant():
+    """解析 /status 的查询参数，返回 (format, since, offset, limit)，作为已结束任务响应的缓存键
+
+    ?format=segments|columnar|msgpack（或 Accept: application/msgpack）决定 result 的编码，
+    未指定时为None，使用提交任务时的 result_format；msgpack 为列式结果的二进制编码。
+    """
+    result_format = request.args.get('format')
+    if result_format is None:
+        wants_binary = request.accept_mimetypes.best_match(['application/json', *MSGPACK_MIMETYPES]) in MSGPACK_MIMETYPES
+        result_format = 'msgpack' if wants_binary else None
+    elif result_format not in (*RESULT_FORMATS, 'msgpack'):
+        raise ValueError(f"format must be one of: {', '.join(RESULT_FORMATS)}, msgpack")
+    
+    values = {}
+    for name in ('since', 'offset', 'limit'):
+        value = request.args.get(name)
+        if value is None:
+            continue
+        try:
+            values[name] = int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer")
+        if values[name] < 0:
+            raise ValueError(f"{name} must not be negative")
+    if 'since' in values and ('offset' in values or 'limit' in values):
+        raise ValueError("Use either since or offset/limit, not both")
+    return result_format, values.get('since'), values.get('offset', 0), values.get('limit')
+
+def encode_task_status(status: Dict[str, Any], result_format: str) -> Payload:
+    """按编码把任务状态序列化为不可变的响应体"""
+    if isinstance(status.get('result'), dict):
+        status = dict(status)
+        status['result'] = from_columnar(status['result']) if result_format == 'segments' else to_columnar(status['result'])
+    if result_format == 'msgpack':
+        return Payload(msgpack.packb(status, use_bin_type=True, default=json_default), MSGPACK_MIMETYPES[0])
+    # 与 jsonify 的输出一致
+    return Payload(f"{app.json.dumps(status)}\n".encode('utf-8'), 'application/json')
+
+def payload_response(payload: Payload):
+    """返回序列化好的响应：If-None-Match 匹配时304，否则按 Accept-Encoding 压缩后分块输出"""
+    coding = None
+    if len(payload.body) >= MIN_COMPRESS_BYTES:
+        coding = request.accept_encodings.best_match(['gzip', 'deflate'])
+    headers = {
+        'ETag': f'"{payload.etag(coding)}"',
+        'Vary': 'Accept, Accept-Encoding',
+        'Cache-Control': 'no-cache',
+    }
+    if request.if_none_match.star_tag or any(request.if_none_match.contains_weak(tag) for tag in payload.etags()):
+        if status_payloads:
+            status_payloads.record_not_modified()
+        return Response(status=304, headers=headers)
+    
+    body = payload.body
+    if coding:
+        body = status_payloads.encoded(payload, coding) if status_payloads else payload.encoded(coding)
+        headers['Content-Encoding'] = coding
+    headers['Content-Length'] = str(len(body))
+    return Response(iter_chunks(body), mimetype=payload.mimetype, headers=headers, direct_passthrough=True)
+
+def discard_status_payloads(task_id: str):
+    """任务被清理后丢弃其缓存的响应"""
+    if status_payloads:
+        status_payloads.discard(task_id)
+
+def slice_task_segments(status: Dict[str, Any], since: int, result_format: str) -> Dict[str, Any]:
+    """返回只包含第since个之后片段的状态副本
+
+    已完成任务按片段格式返回时，新增片段移到顶层 segments；按列式/msgpack返回时与分页相同，
+    新增片段留在 result 中编码为列式，result 的 text 只包含这些片段的文本。
+    """
+    with _status_lock:
+        status = dict(status)
+        if isinstance(status.get('result'), dict):
+            result = dict(from_columnar(status['result']))
+            all_segments = result.pop('segments', [])
+            if result_format != 'segments':
+                result['segments'] = all_segments[since:]
+                result['text'] = " ".join(segment['text'] for segment in result['segments'])
+            else:
+                status['segments'] = all_segments[since:]
+            status['result'] = result
+        else:
+            all_segments = status.get('segments', [])
+            status['segments'] = all_segments[since:]
+        status['segments_total'] = len(all_segments)
+        status['next_since'] = len(all_segments)
+    return status
+
+def paginate_task_segments(status: Dict[str, Any], offset: int, limit: Optional[int]) -> Dict[str, Any]:
+    """返回只包含第offset个起最多limit个片段的状态副本
+
+    结果的 text 只包含本页片段的文本；pagination.next_offset 为下一页的 offset，已到最后一页时为None。
+    """
+    with _status_lock:
+        status = dict(status)
+        end = None if limit is None else offset + limit
+        if isinstance(status.get('result'), dict):
+            result = dict(from_columnar(status['result']))
+            all_segments = result.get('segments', [])
+            result['segments'] = all_segments[offset:end]
+            result['text'] = " ".join(segment['text'] for segment in result['segments'])
+            status['result'] = result
+        else:
+            all_segments = status.get('segments', [])
+            status['segments'] = all_segments[offset:end]
+        total = len(all_segments)
+        status['pagination'] = {
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "next_offset": end if end is not None and end < total else None,
+        }
+    return status
+
+def decode_metrics(position: float, duration: Optional[float], elapsed: float) -> Dict[str, Any]:
+    """根据已解码音频位置计算实时率(RTF)和预计剩余时间"""
+    metrics = {
+        "audio_position": round(position, 2),
+        "decode_seconds": round(elapsed, 2),
+        "realtime_factor": None,
+        "eta_seconds": None,
+    }
+    if position > 0:
+        rtf = elapsed / position
+        metrics["realtime_factor"] = round(rtf, 3)
+        if duration:
+            metrics["eta_seconds"] = round(max(0.0, duration - position) * rtf, 1)
+    return metrics
+
+def progress_event_data(status: Dict[str, Any]) -> Dict[str, Any]:
+    """从任务记录中提取进度事件的字段"""
+    keys = ('status', 'progress', 'progress_text', 'segments_count', 'audio_position',
+            'decode_seconds', 'realtime_factor', 'eta_seconds')
+    return {key: status[key] for key in keys if key in status}
+
+def task_identity(status: Dict[str, Any]) -> Dict[str, Any]:
+    """任务结束时需要保留的原始字段（创建时间用于过期清理）"""
+    keys = ('task_id', 'filename', 'language', 'model', 'audio_id', 'ranges', 'result_format', 'cache_hit',
+            'deduplicated_requests', 'created_at')
+    return {key: status[key] for key in keys if key in status}
+
+@app.route('/admin/purge', methods=['POST'])
+def purge_tasks():
+    """批量清理已结束的任务
+    
+    参数（JSON或表单）：older_than_hours 只清理早于该时长创建的任务（默认0，即全部），
+    status 逗号分隔的状态列表（默认 completed,error,cancelled）
+    """
+    params = request.get_json(silent=True) or request.form or request.args
+    try:
+        older_than_hours = float(params.get('older_than_hours', 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "older_than_hours must be a number"}), 400
+    statuses = tuple(s.strip() for s in str(params.get('status', ','.join(TERMINAL_STATUSES))).split(',') if s.strip())
+    if not statuses or any(s not in TERMINAL_STATUSES for s in statuses):
+        return jsonify({"error": f"status must be a comma separated list of {'/'.join(TERMINAL_STATUSES)}"}), 400
+    
+    purged = processing_status.purge(older_than_hours * 3600, statuses)
+    for task_id in purged:
+        task_events.discard(task_id)
+        discard_status_payloads(task_id)
+    logger.info(f"Admin purge removed {len(purged)} tasks (older_than_hours={older_than_hours}, status={statuses})")
+    return jsonify({"purged": len(purged), "task_ids": purged})
+
+@app.route('/tasks/<task_id>', methods=['DELETE'])
+def cancel_task_request(task_id):
+    """取消进行中的任务，或删除已结束的任务
+    
+    排队中的任务直接移出队列；正在转录的任务在下一个片段边界停止，释放工作线程、删除临时文件，
+    状态记为 cancelled（202，之后可通过 /status 或 /events 确认）。
+    内容相同的请求共享同一个任务时，只解除一个请求的关联，最后一个请求取消时才真正取消任务。
+    """
+    # 与任务结束时写入终态、关联重复请求使用同一把锁，不会把已结束的任务标记为取消
+    with _status_lock:
+        record = processing_status.get(task_id)
+        finished = record is not None and record.get('status') in TERMINAL_STATUSES
+        requesters = record.get('requesters', 1) if record is not None and not finished else 0
+        if requesters > 1:
+            record['requesters'] = requesters - 1
+        elif requesters == 1:
+            cancelled_tasks.add(task_id)
+    if record is None:
+        return jsonify({"error": "Task not found", "task_id": task_id}), 404
+    if requesters > 1:
+        logger.info(f"任务 {task_id} 解除一个请求的关联，仍有 {requesters - 1} 个请求等待")
+        return jsonify({
+            "task_id": task_id,
+            "status": record.get('status'),
+            "detached": True,
+            "requesters": requesters - 1,
+            "message": "已解除本请求与任务的关联，其他相同内容的请求仍在等待该任务"
+        })
+    if finished:
+        processing_status.pop(task_id, None)
+        task_events.discard(task_id)
+        discard_status_payloads(task_id)
+        logger.info(f"Deleted task: {task_id}")
+        return jsonify({"task_id": task_id, "deleted": True})
+    
+    job = scheduler.cancel(task_id)
+    if job is not None:
+        # 尚未开始的任务在当前线程执行一次：入口处检查到取消，只记录状态并清理输入
+        job.func(*job.args, **job.kwargs)
+        return jsonify({"task_id": task_id, "status": "cancelled"})
+    logger.info(f"任务 {task_id} 已请求取消")
+    return jsonify({"task_id": task_id, "status": "cancelling"}), 202
+
+class TaskCancelled(Exception):
+    """任务已被 DELETE /tasks/<task_id> 取消"""
+
+def check_cancelled(task_id: str):
+    """任务已请求取消时抛出 TaskCancelled"""
+    if task_id in cancelled_tasks:
+        raise TaskCancelled(task_id)
+
 def update_task_progress(task_id: str, progress: int, status: str = 'processing', progress_text: str = None):
     """更新任务进度"""
     if task_id in processing_status:
@@ -198,130 +707,380 @@ def update_task_progress(task_id: str, progress: int, status: str = 'processing'
             processing_status[task_id]['progress_text'] = progress_text
         processing_status[task_id]['updated_at'] = datetime.now().isoformat()
         logger.info(f"任务 {task_id}: {progress}% - {progress_text or status}")
+        task_events.publish(task_id, 'progress', progress_event_data(processing_status[task_id]))
+
+def complete_task(task_id: str, segments: list, language: str, duration: float, decode_started: float,
+                  ranges: Optional[list] = None):
+    """写入最终结果并推送完成事件（片段已完成繁简转换）
+
+    只转录了部分时间范围时 duration 为请求范围的总时长，ranges 记录实际转录的范围。
+    """
+    decode_seconds = time.time() - decode_started
+    result = {
+        "text": " ".join([segment["text"] for segment in segments]),
+        "language": language,
+        "duration": duration,
+        "segments": segments
+    }
+    if ranges:
+        result["ranges"] = [list(r) for r in ranges]
+    
+    with _status_lock:
+        cancelled_tasks.discard(task_id)
+        previous = processing_status.get(task_id) or {}
+        # 选择列式结果的任务以列式保存，内存和存储中不再保留每个词一个字典
+        columnar = previous.get('result_format') == 'columnar'
+        processing_status[task_id] = {
+            **task_identity(previous),
+            "status": "completed",
+            "progress": 100,
+            "progress_text": "转录完成",
+            "result": to_columnar(result) if columnar else result,
+            "decode_seconds": round(decode_seconds, 2),
+            "realtime_factor": round(decode_seconds / duration, 3) if duration else None,
+            "completed_at": datetime.now().isoformat()
+        }
+    task_events.publish(task_id, 'completed', processing_status[task_id])
+    
+    # 写入结果缓存并结束单飞登记
+    key = previous.get('cache_key')
+    if result_cache is not None and key:
+        result_cache.put(key, result)
+        result_cache.release(previous.get('inflight_key'), task_id)
+    
+    logger.info(f"任务 {task_id} 转录完成")
+
+def fail_task(task_id: str, error_msg: str):
+    """标记任务失败并推送错误事件"""
+    logger.error(f"任务 {task_id} 转录失败: {error_msg}")
+    with _status_lock:
+        cancelled_tasks.discard(task_id)
+        previous = processing_status.get(task_id) or {}
+        processing_status[task_id] = {
+            **task_identity(previous),
+            "status": "error",
+            "error": error_msg,
+            "progress": 0,
+            "completed_at": datetime.now().isoformat()
+        }
+    task_events.publish(task_id, 'error', processing_status[task_id])
+    if result_cache is not None and previous.get('inflight_key'):
+        result_cache.release(previous['inflight_key'], task_id)
 
-def process_audio_with_progress(task_id: str, file_path: str, language: str = None, word_timestamps: bool = False):
-    """带进度更新的音频处理"""
+def cancel_task(task_id: str):
+    """标记任务已取消并推送取消事件（已识别的部分片段不保留）"""
+    logger.info(f"任务 {task_id} 已取消")
+    with _status_lock:
+        cancelled_tasks.discard(task_id)
+        previous = processing_status.get(task_id) or {}
+        processing_status[task_id] = {
+            **task_identity(previous),
+            "status": "cancelled",
+            "progress": previous.get('progress', 0),
+            "completed_at": datetime.now().isoformat()
+        }
+    task_events.publish(task_id, 'cancelled', processing_status[task_id])
+    if result_cache is not None and previous.get('inflight_key'):
+        result_cache.release(previous['inflight_key'], task_id)
+
+def submit_batched(task_id: str, audio, language: Optional[str]):
+    """把不超过一个窗口的短音频交给微批处理线程，结果在回调中写回任务"""
+    update_task_progress(task_id, 0, 'processing', '等待批量推理...')
+    decode_started = time.time()
+    future = batcher.submit(audio, "zh" if language == "zh-cn" else language)
+    
+    def on_done(future):
+        if task_id in cancelled_tasks:
+            cancel_task(task_id)
+            return
+        try:
+            output = future.result()
+            needs_simplified = language == "zh-cn" or output["language"] == "zh"
+            segments = [{
+                "start": segment["start"],
+                "end": segment["end"],
+                "text": convert_to_simplified_chinese(segment["text"]) if needs_simplified else segment["text"]
+            } for segment in output["segments"]]
+            
+            with _status_lock:
+                if task_id in processing_status:
+                    processing_status[task_id]['segments'] = list(segments)
+                    processing_status[task_id]['segments_count'] = len(segments)
+            for i, segment_data in enumerate(segments):
+                task_events.publish(task_id, 'segment', {"index": i, "segment": segment_data})
+            complete_task(task_id, segments, output["language"], output["duration"], decode_started)
+        except Exception as e:
+            fail_task(task_id, str(e))
+    
+    future.add_done_callback(on_done)
+    return DEFERRED
+
+def process_audio_with_progress(task_id: str, file_path: Optional[str], language: str = None, word_timestamps: bool = False,
+                                model_name: Optional[str] = None, audio_id: Optional[str] = None,
+                                delete_input: bool = True, ranges: Optional[list] = None):
+    """带进度更新的音频处理
+
+    file_path 为上传的临时文件（处理后删除），或 --input-dirs 中的调用方文件（delete_input=False，原地读取不删除）；
+    audio_id 不为空时使用 POST /audio 存储的已解码PCM。
+    ranges 不为空时只解码和转录这些时间范围，片段时间戳仍是整个录音中的绝对时间。
+    """
+    audio = None
+    reader = None
+    samples = None
+    clip_readers = []
+    segment_stream = None
     try:
-        # 1. 开始处理 (10%)
-        update_task_progress(task_id, 10, 'processing', '音频分析中...')
-        
-        # 模拟音频分析
-        time.sleep(1)
+        # 模型加载期间提交的任务在此等待
+        check_cancelled(task_id)
+        model_ready.wait()
+        if model_state["status"] == "failed":
+            raise RuntimeError(f"Model failed to load: {model_state['error']}")
+        check_cancelled(task_id)
         
-        # 2. 音频预处理完成 (25%)
-        update_task_progress(task_id, 25, 'processing', '语音识别准备中...')
-        
-        # 3. 开始转录 (30%)
-        update_task_progress(task_id, 30, 'processing', '语音识别进行中...')
-        
-        # 执行转录，支持词级时间戳
         # 处理语言参数 - 如果是'auto'或None则让引擎自动检测
         if language == 'auto':
             language = None  # 转换为None让引擎自动检测
-            
-        if language == "zh-cn":
-            # 对于简体中文，使用中文转录
-            segments, info = model.transcribe(file_path, language="zh", word_timestamps=word_timestamps)
-        elif language is None:
-            # 自动检测语言
-            segments, info = model.transcribe(file_path, word_timestamps=word_timestamps)
+        
+        model_name = model_registry.resolve(model_name)
+        is_default_model = model_name == model_registry.default
+        whisper_language = "zh" if language == "zh-cn" else language
+        
+        if audio_id is not None:
+            # 已上传的音频直接映射存储的PCM（上传后已在后台解码），时长精确已知
+            update_task_progress(task_id, 0, 'processing', '等待音频解码...')
+            samples = audio_store.samples(audio_id)
+            duration = len(samples) / SAMPLE_RATE
+            check_cancelled(task_id)
         else:
-            segments, info = model.transcribe(file_path, language=language, word_timestamps=word_timestamps)
+            # ffmpeg流式解码，内存占用只与窗口长度有关；容器头中的时长用于进度和路径选择
+            reader = FfmpegPcmDecoder(source=file_path)
+            duration = reader.duration()
+        
+        if ranges:
+            # 片段转录：按录音时长截断范围，进度、实时率和时长都按请求的范围计算
+            ranges = clip_ranges(ranges, duration)
+            if not ranges:
+                raise ValueError(f"Requested ranges start after the end of the recording ({duration:.1f}s)")
+            duration = requested_seconds(ranges)
+            if reader is not None:
+                reader.close()
+            
+            def open_range(range_start: float, range_end: Optional[float]):
+                """只解码一个范围：已解码的PCM直接切片，文件由ffmpeg从范围起点定位解码"""
+                if samples is not None:
+                    return iter_pcm_chunks(slice_samples(samples, range_start, range_end, SAMPLE_RATE))
+                clip_reader = FfmpegPcmDecoder(input_args=ffmpeg_range_args(range_start, range_end), source=file_path)
+                clip_readers.append(clip_reader)
+                return clip_reader.iter_pcm()
         
-        # 4. 转录进行中进度更新
-        segments_list = list(segments)
-        total_segments = len(segments_list)
+        if duration:
+            with _status_lock:
+                if task_id in processing_status:
+                    processing_status[task_id]['duration'] = duration
+            scheduler.report_audio_duration(task_id, duration)
         
-        processed_segments = []
-        for i, segment in enumerate(segments_list):
-            # 计算进度 (30% - 70%)
-            progress = 30 + int((i + 1) / total_segments * 40)
-            update_task_progress(task_id, progress, 'processing', f'处理音频片段 {i+1}/{total_segments}...')
+        # 长音频多进程并行转录：静音切分需要完整缓冲，解码到内存映射文件
+        # 批处理和并行转录都只使用默认模型
+        use_parallel = (parallel_transcriber is not None and is_default_model and not ranges
+                        and duration and duration >= args.parallel_min_duration)
+        if ranges:
+            pass  # 各范围在转录时按需解码
+        elif use_parallel:
+            if samples is not None:
+                audio = DecodedAudio(samples)
+            else:
+                reader.close()
+                audio = decode_file(file_path)
+        else:
+            pcm_chunks = iter_pcm_chunks(samples) if samples is not None else reader.iter_pcm()
+            # 短音频（一个窗口内读到结尾）走跨请求批处理，由批处理线程完成任务，工作线程立即释放
+            if batcher is not None and is_default_model and not word_timestamps:
+                short_audio, pcm_chunks = peek_pcm(pcm_chunks, BATCH_WINDOW_SECONDS * SAMPLE_RATE)
+                if short_audio is not None:
+                    return submit_batched(task_id, short_audio, language)
+        
+        # 转录期间持有模型租约，避免被LRU淘汰
+        with model_registry.use(model_name) as whisper_model:
+            update_task_progress(task_id, 0, 'processing', '语音识别准备中...')
+            decode_started = time.time()
+            detected = {"language": whisper_language}
             
-            # 构建segment数据，包含词级时间戳
-            segment_data = {
-                "start": segment.start,
-                "end": segment.end,
-                "text": segment.text
-            }
+            # 执行转录，支持词级时间戳；两条路径都逐个产出带绝对时间戳的片段字典
+            if use_parallel:
+                # 长音频在静音处切块，由进程池并行转录，片段按时间顺序返回
+                segments, info = parallel_transcriber.transcribe(
+                    audio.samples,
+                    language=whisper_language,
+                    word_timestamps=word_timestamps,
+                    language_detector=lambda samples: detect_language(model, samples)
+                )
+                detected["language"] = info.language
+                segment_stream = (segment_to_dict(segment, 0, word_timestamps) for segment in segments)
+            elif ranges:
+                # 依次转录各个范围，第一个范围检测到的语言用于后续范围
+                segment_stream = transcribe_ranges(
+                    whisper_model, open_range, ranges, language=whisper_language, word_timestamps=word_timestamps,
+                    info_callback=lambda info: detected.update(language=info.language)
+                )
+            else:
+                # 按30秒窗口边解码边转录（未指定语言时由第一个窗口检测）
+                segment_stream = transcribe_pcm_windows(
+                    whisper_model, pcm_chunks, language=whisper_language, word_timestamps=word_timestamps,
+                    info_callback=lambda info: detected.update(language=info.language)
+                )
             
-            # 如果启用了词级时间戳，添加words数组
-            if word_timestamps and hasattr(segment, 'words') and segment.words:
-                words_list = []
-                for word in segment.words:
-                    word_data = {
-                        "word": word.word,
-                        "start": word.start,
-                        "end": word.end,
-                        "probability": word.probability
-                    }
-                    words_list.append(word_data)
-                segment_data["words"] = words_list
+            # 初始化部分结果列表
+            with _status_lock:
+                if task_id in processing_status:
+                    processing_status[task_id]['segments'] = []
+                    processing_status[task_id]['segments_count'] = 0
             
-            processed_segments.append(segment_data)
+            # 逐个消费生成器，片段解码出来就追加到任务记录中；
+            # 每个片段之后检查取消请求，取消时不再从生成器拉取下一个片段
+            processed_segments = []
+            check_cancelled(task_id)
+            for i, segment_data in enumerate(segment_stream):
+                # 繁简转换在片段产生时完成，部分结果与最终结果保持一致
+                if language == "zh-cn" or detected["language"] == "zh":
+                    convert_segment_to_simplified(segment_data)
+                processed_segments.append(segment_data)
+                
+                # 按已解码的音频位置计算进度、实时率和剩余时间
+                elapsed = time.time() - decode_started
+                position = requested_position(ranges, segment_data["end"]) if ranges else segment_data["end"]
+                position = min(position, duration) if duration else position
+                with _status_lock:
+                    if task_id in processing_status:
+                        processing_status[task_id]['segments'].append(segment_data)
+                        processing_status[task_id]['segments_count'] = i + 1
+                        processing_status[task_id].update(decode_metrics(position, duration, elapsed))
+                task_events.publish(task_id, 'segment', {"index": i, "segment": segment_data})
+                progress = min(99, int(position / duration * 100)) if duration else 0
+                update_task_progress(task_id, progress, 'processing', f'已识别 {i+1} 个音频片段...')
+                check_cancelled(task_id)
             
-            # 短暂延迟以显示进度
-            if total_segments > 10:  # 只对长音频显示详细进度
-                time.sleep(0.1)
-        
-        # 5. 文本处理 (70%)
-        update_task_progress(task_id, 70, 'processing', '文本处理中...')
-        
-        # 合并文本
-        text = " ".join([segment["text"] for segment in processed_segments])
-        
-        # 6. 繁简转换 (85%)
-        update_task_progress(task_id, 85, 'processing', '繁简转换中...')
-        
-        # 繁简转换
-        if language == "zh-cn" or info.language == "zh":
-            text = convert_to_simplified_chinese(text)
-            for segment in processed_segments:
-                segment["text"] = convert_to_simplified_chinese(segment["text"])
-        
-        # 7. 完成 (100%)
-        result = {
-            "text": text,
-            "language": info.language,
-            "duration": info.duration,
-            "segments": processed_segments
-        }
-        
-        with _status_lock:
-            processing_status[task_id] = {
-                "status": "completed",
-                "progress": 100,
-                "progress_text": "转录完成",
-                "result": result,
-                "completed_at": datetime.now().isoformat()
-            }
-        save_status_to_file()
-        
-        logger.info(f"任务 {task_id} 转录完成")
+            # 完成 (100%)；容器头没有时长时使用实际解码的长度
+            if not duration and ranges:
+                duration = sum(clip_reader.samples_decoded for clip_reader in clip_readers) / SAMPLE_RATE
+            elif not duration and reader is not None:
+                duration = audio.duration if audio is not None else reader.samples_decoded / SAMPLE_RATE
+            complete_task(task_id, processed_segments, detected["language"], duration, decode_started, ranges)
         
+    except TaskCancelled:
+        cancel_task(task_id)
+        return CANCELLED
     except Exception as e:
-        error_msg = str(e)
-        logger.error(f"任务 {task_id} 转录失败: {error_msg}")
-        with _status_lock:
-            processing_status[task_id] = {
-                "status": "error",
-                "error": error_msg,
-                "progress": 0,
-                "completed_at": datetime.now().isoformat()
-            }
-        save_status_to_file()
+        fail_task(task_id, str(e))
     finally:
-        # 清理临时文件
+        # 清理解码器和临时文件；批处理路径的短音频在内存中，由批处理线程持有引用
+        # 关闭片段生成器：取消时停止窗口解码，并行转录取消尚未开始的块
+        if segment_stream is not None:
+            segment_stream.close()
+        if reader is not None:
+            reader.close()
+        for clip_reader in clip_readers:
+            clip_reader.close()
+        if audio is not None:
+            audio.close()
+        # 已上传的音频保留到过期，只归还租约
+        if audio_id is not None:
+            audio_store.release(audio_id)
+        elif delete_input:
+            try:
+                if os.path.exists(file_path):
+                    os.unlink(file_path)
+                    logger.info(f"Cleaned up temporary file: {file_path}")
+            except Exception as e:
+                logger.warning(f"Failed to clean up temporary file {file_path}: {e}")
+
+# 强化文件名编码处理 - 处理多种可能的编码问题
+def fix_filename_encoding(raw_filename, fallback: str):
+    """修复文件名编码问题的强化函数"""
+    if not raw_filename:
+        return fallback
+
+    # 尝试多种编码修复策略
+    strategies = [
+        # 策略1: 直接使用（如果已经是正确的UTF-8）
+        lambda fn: fn if isinstance(fn, str) and fn.encode('utf-8') else None,
+
+        # 策略2: 如果是bytes，尝试UTF-8解码
+        lambda fn: fn.decode('utf-8') if isinstance(fn, bytes) else None,
+
+        # 策略3: 尝试从Latin-1解码为UTF-8（常见的HTTP传输问题）
+        lambda fn: fn.encode('latin-1').decode('utf-8') if isinstance(fn, str) else None,
+
+        # 策略4: 尝试从GBK解码（中文系统常见问题）
+        lambda fn: fn.encode('latin-1').decode('gbk') if isinstance(fn, str) else None,
+
+        # 策略5: 使用chardet自动检测编码
+        lambda fn: _detect_and_decode(fn) if isinstance(fn, (str, bytes)) else None,
+    ]
+
+    for i, strategy in enumerate(strategies):
         try:
-            if os.path.exists(file_path):
-                os.unlink(file_path)
-                logger.info(f"Cleaned up temporary file: {file_path}")
+            result = strategy(raw_filename)
+            if result and result != raw_filename:
+                logger.info(f"文件名编码修复成功 (策略{i+1}): {raw_filename} -> {result}")
+                # 验证结果
+                result.encode('utf-8')
+                return result
+            elif result:
+                return result
         except Exception as e:
-            logger.warning(f"Failed to clean up temporary file {file_path}: {e}")
+            logger.debug(f"文件名编码策略{i+1}失败: {e}")
+            continue
 
-@app.route('/inference', methods=['POST'])
-def transcribe():
-    """转录音频文件"""
+    # 所有策略都失败，使用安全的回退名称
+    logger.warning(f"文件名编码修复失败，使用安全名称: {raw_filename}")
+    return fallback
+
+def _detect_and_decode(data):
+    """使用chardet检测编码并解码"""
+    try:
+        import chardet
+        if isinstance(data, str):
+            data = data.encode('latin-1')  # 先转为bytes
+        detected = chardet.detect(data)
+        if detected and detected['confidence'] > 0.8:
+            return data.decode(detected['encoding'])
+    except ImportError:
+        logger.debug("chardet库未安装，跳过自动编码检测")
+    except Exception as e:
+        logger.debug(f"自动编码检测失败: {e}")
+    return None
+
+def upload_display_filename(file, fallback: str) -> str:
+    """上传文件的显示名称：优先使用表单中的 filename_base64，否则修复 file.filename 的编码"""
+    # 处理Base64编码的文件名
+    filename_base64 = request.form.get('filename_base64')
+    if filename_base64:
+        try:
+            import base64
+            import urllib.parse
+            # 解码Base64文件名
+            decoded_filename = urllib.parse.unquote(base64.b64decode(filename_base64).decode('utf-8'))
+            filename_display = decoded_filename
+            logger.info(f"文件名Base64解码成功: {file.filename} -> {filename_display}")
+        except Exception as e:
+            logger.warning(f"文件名Base64解码失败: {e}, 使用原文件名")
+            filename_display = fix_filename_encoding(file.filename, fallback)
+    else:
+        # 应用文件名修复
+        try:
+            filename_display = fix_filename_encoding(file.filename, fallback)
+        except Exception as e:
+            logger.error(f"文件名处理发生意外错误: {e}")
+            filename_display = fallback
+    return filename_display
+
+@app.route('/audio', methods=['POST'])
+def upload_audio():
+    """上传音频并在后台解码，返回 audio_id
+
+    之后 /inference 传 audio_id 即可以不同的模型、语言等参数重复转录，不再上传和解码。
+    audio_id 在最后一次使用后 --audio-ttl-minutes 分钟过期。
+    """
     if 'file' not in request.files:
         return jsonify({"error": "No file provided"}), 400
     
@@ -329,6 +1088,49 @@ def transcribe():
     if file.filename == '':
         return jsonify({"error": "Empty filename"}), 400
     
+    upload = file.stream
+    file_size, content_sha256 = upload.size, upload.sha256
+    temp_file_path = upload.persist()
+    try:
+        stored = audio_store.add(temp_file_path, upload_display_filename(file, "音频文件"), file_size, content_sha256)
+    except Exception as e:
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+        logger.error(f"保存上传音频失败: {e}")
+        return jsonify({"error": f"保存上传音频失败: {str(e)}"}), 500
+    
+    logger.info(f"已保存上传音频 {stored.audio_id} - 文件: {stored.filename}, "
+                f"大小: {file_size / (1024 * 1024):.1f} MB, sha256: {content_sha256[:12]}")
+    return jsonify(stored.to_dict()), 201
+
+@app.route('/audio/<audio_id>', methods=['GET'])
+def get_audio(audio_id):
+    """查询已上传音频的解码状态、时长和过期时间"""
+    try:
+        return jsonify(audio_store.get(audio_id).to_dict())
+    except AudioNotFoundError:
+        return jsonify({"error": "Audio not found"}), 404
+
+@app.route('/audio/<audio_id>', methods=['DELETE'])
+def delete_audio(audio_id):
+    """提前删除已上传音频；正在使用它的任务结束后再删除文件"""
+    if not audio_store.delete(audio_id):
+        return jsonify({"error": "Audio not found"}), 404
+    return jsonify({"audio_id": audio_id, "deleted": True})
+
+@app.route('/inference', methods=['POST'])
+def transcribe():
+    """转录音频文件（上传的 file、POST /audio 返回的 audio_id，或 --input-dirs 中的服务端文件 path）"""
+    audio_id = request.form.get('audio_id') or None
+    input_path = (request.form.get('path') or None) if audio_id is None else None
+    if audio_id is None and input_path is None:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file, audio_id or path provided"}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "Empty filename"}), 400
+    
     # 获取语言参数和词级时间戳设置
     language = request.form.get('language', 'auto')
     word_timestamps = request.form.get('word_timestamps', 'false').lower() == 'true'
@@ -336,141 +1138,350 @@ def transcribe():
     # 处理语言参数 - 如果是'auto'则不传递语言参数让引擎自动检测
     whisper_language = None if language == 'auto' else language
     
-    logger.info(f"转录参数 - 语言: {language} (whisper参数: {whisper_language}), 词级时间戳: {word_timestamps}")
+    # 模型加载失败时直接拒绝；加载中的任务可以先排队
+    if model_state["status"] == "failed":
+        return model_unavailable_response()
+    
+    # 模型参数：只允许已配置的模型，未指定时使用默认模型
+    try:
+        model_name = model_registry.resolve(request.form.get('model'))
+    except UnknownModelError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # 结果编码：columnar 以并行数组保存和返回结果（/status 可用 format 参数另行指定）
+    result_format = request.form.get('result_format', 'segments')
+    if result_format not in RESULT_FORMATS:
+        return jsonify({"error": f"result_format must be one of: {', '.join(RESULT_FORMATS)}"}), 400
+    
+    # 优先级类别：interactive（默认，如语音备忘）先于 batch（如批量导入的长录音）
+    priority = request.form.get('priority', DEFAULT_PRIORITY)
+    if priority not in PRIORITY_OFFSETS:
+        return jsonify({"error": f"priority must be one of: {', '.join(PRIORITY_OFFSETS)}"}), 400
+    
+    # 时间范围：start/end（秒）或 ranges，只转录这些部分
+    try:
+        ranges = parse_ranges(request.form.get('start'), request.form.get('end'), request.form.get('ranges'))
+    except ClipRangeError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    logger.info(f"转录参数 - 语言: {language} (whisper参数: {whisper_language}), 词级时间戳: {word_timestamps}, 模型: {model_name}"
+                + (f", 范围: {ranges}" if ranges else ""))
+    
+    # 持有的输入（上传的临时文件或已上传音频的租约）在提交到调度器后移交给任务，
+    # 之前任何返回或异常都要释放，且只释放一次
+    temp_file_path = None
+    input_held = False
+    
+    def release_input():
+        """任务未提交时释放输入：删除上传的临时文件，或归还已上传音频的租约"""
+        nonlocal input_held
+        if not input_held:
+            return
+        input_held = False
+        if audio_id is not None:
+            audio_store.release(audio_id)
+        elif os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
     
     try:
         # 生成任务ID（使用时间戳确保唯一性）
-        task_id = f"task_{int(time.time() * 1000)}_{len(processing_status)}"
+        task_id = f"task_{int(time.time() * 1000)}_{next(_task_counter)}"
         
-        # 保存临时文件
-        temp_dir = tempfile.gettempdir()
-        file_extension = os.path.splitext(file.filename)[1] or '.wav'
-        temp_file_path = os.path.join(temp_dir, f"whisper_{task_id}{file_extension}")
-        file.save(temp_file_path)
-        
-        # 强化文件名编码处理 - 处理多种可能的编码问题
-        def fix_filename_encoding(raw_filename):
-            """修复文件名编码问题的强化函数"""
-            if not raw_filename:
-                return f"音频文件_{task_id}"
-            
-            # 尝试多种编码修复策略
-            strategies = [
-                # 策略1: 直接使用（如果已经是正确的UTF-8）
-                lambda fn: fn if isinstance(fn, str) and fn.encode('utf-8') else None,
-                
-                # 策略2: 如果是bytes，尝试UTF-8解码
-                lambda fn: fn.decode('utf-8') if isinstance(fn, bytes) else None,
-                
-                # 策略3: 尝试从Latin-1解码为UTF-8（常见的HTTP传输问题）
-                lambda fn: fn.encode('latin-1').decode('utf-8') if isinstance(fn, str) else None,
-                
-                # 策略4: 尝试从GBK解码（中文系统常见问题）
-                lambda fn: fn.encode('latin-1').decode('gbk') if isinstance(fn, str) else None,
-                
-                # 策略5: 使用chardet自动检测编码
-                lambda fn: _detect_and_decode(fn) if isinstance(fn, (str, bytes)) else None,
-            ]
-            
-            for i, strategy in enumerate(strategies):
-                try:
-                    result = strategy(raw_filename)
-                    if result and result != raw_filename:
-                        logger.info(f"文件名编码修复成功 (策略{i+1}): {raw_filename} -> {result}")
-                        # 验证结果
-                        result.encode('utf-8')
-                        return result
-                    elif result:
-                        return result
-                except Exception as e:
-                    logger.debug(f"文件名编码策略{i+1}失败: {e}")
-                    continue
-            
-            # 所有策略都失败，使用安全的回退名称
-            logger.warning(f"文件名编码修复失败，使用安全名称: {raw_filename}")
-            return f"音频文件_{task_id}"
-        
-        def _detect_and_decode(data):
-            """使用chardet检测编码并解码"""
+        if audio_id is not None:
+            # 已上传的音频：不再传输和解码，任务结束前持有租约，期间不会过期
             try:
-                import chardet
-                if isinstance(data, str):
-                    data = data.encode('latin-1')  # 先转为bytes
-                detected = chardet.detect(data)
-                if detected and detected['confidence'] > 0.8:
-                    return data.decode(detected['encoding'])
-            except ImportError:
-                logger.debug("chardet库未安装，跳过自动编码检测")
-            except Exception as e:
-                logger.debug(f"自动编码检测失败: {e}")
-            return None
-        
-        # 处理Base64编码的文件名
-        filename_base64 = request.form.get('filename_base64')
-        if filename_base64:
+                stored = audio_store.acquire(audio_id)
+            except AudioNotFoundError:
+                return jsonify({"error": f"Unknown or expired audio_id: {audio_id}"}), 404
+            input_held = True
+            if stored.status == 'failed':
+                release_input()
+                return jsonify({"error": f"Audio could not be decoded: {stored.error}"}), 422
+            file_size, content_sha256 = stored.size, stored.sha256
+            temp_file_path = None
+            filename_display = stored.filename
+        elif input_path is not None:
+            # 与调用方共享文件系统：原地读取文件，不经过multipart传输和落盘；文件归调用方所有，不删除
             try:
-                import base64
-                import urllib.parse
-                # 解码Base64文件名
-                decoded_filename = urllib.parse.unquote(base64.b64decode(filename_base64).decode('utf-8'))
-                filename_display = decoded_filename
-                logger.info(f"文件名Base64解码成功: {file.filename} -> {filename_display}")
-            except Exception as e:
-                logger.warning(f"文件名Base64解码失败: {e}, 使用原文件名")
-                filename_display = fix_filename_encoding(file.filename)
+                temp_file_path = resolve_input_path(input_path, input_dirs)
+            except InputPathError as e:
+                return jsonify({"error": str(e)}), 403
+            except FileNotFoundError as e:
+                return jsonify({"error": str(e)}), 404
+            file_size, content_sha256 = os.path.getsize(temp_file_path), file_sha256(temp_file_path)
+            filename_display = request.form.get('filename') or os.path.basename(temp_file_path)
         else:
-            # 应用文件名修复
-            try:
-                filename_display = fix_filename_encoding(file.filename)
-            except Exception as e:
-                logger.error(f"文件名处理发生意外错误: {e}")
-                filename_display = f"音频文件_{task_id}"
+            # 上传在multipart解析时已分块写入临时文件，并同时计算了大小和sha256，直接移交给任务
+            upload = file.stream
+            file_size, content_sha256 = upload.size, upload.sha256
+            temp_file_path = upload.persist()
+            input_held = True
+            filename_display = upload_display_filename(file, f"音频文件_{task_id}")
         
-        logger.info(f"收到转录请求 - 任务ID: {task_id}, 语言: {language}, 文件: {filename_display}")
+        logger.info(f"收到转录请求 - 任务ID: {task_id}, 语言: {language}, 文件: {filename_display}, "
+                    f"大小: {file_size / (1024 * 1024):.1f} MB, sha256: {content_sha256[:12]}")
+        
+        # 结果缓存：相同音频内容、模型、语言和词级时间戳设置的结果直接返回
+        key = None
+        if result_cache is not None:
+            key = cache_key(content_sha256, model_name, whisper_language, word_timestamps,
+                            **({"ranges": ranges} if ranges else {}))
+            cached_result = result_cache.get(key)
+            if cached_result is not None:
+                release_input()
+                now = datetime.now().isoformat()
+                with _status_lock:
+                    processing_status[task_id] = {
+                        "task_id": task_id,
+                        "status": "completed",
+                        "progress": 100,
+                        "progress_text": "转录完成（缓存）",
+                        "filename": filename_display,
+                        "language": language,
+                        "model": model_name,
+                        "audio_id": audio_id,
+                        "ranges": ranges,
+                        "result_format": result_format,
+                        "cache_hit": True,
+                        "result": to_columnar(cached_result) if result_format == 'columnar' else cached_result,
+                        "created_at": now,
+                        "completed_at": now
+                    }
+                task_events.publish(task_id, 'completed', processing_status[task_id])
+                logger.info(f"任务 {task_id} 命中结果缓存")
+                return jsonify({
+                    "task_id": task_id,
+                    "status": "completed",
+                    "cache_hit": True,
+                    "message": "命中转录结果缓存"
+                })
         
-        # 获取音频时长
-        duration = get_audio_duration(temp_file_path)
-        logger.info(f"音频时长: {duration} 秒" if duration else "无法获取音频时长")
+        # 调度代价：已上传音频的时长在解码后已知，其他输入由ffmpeg读取容器头；只转录部分范围时按请求的时长计
+        audio_seconds = stored.duration if audio_id is not None else None
+        if audio_seconds is None:
+            audio_seconds = probe_duration(audio_store.source_path(audio_id) if audio_id is not None else temp_file_path)
+        if ranges:
+            clipped = clip_ranges(ranges, audio_seconds)
+            if not clipped:
+                # 时长已知且所有范围都在录音结尾之后：提交时直接拒绝，不进入队列
+                release_input()
+                return jsonify({"error": f"Requested ranges start after the end of the recording "
+                                         f"({audio_seconds:.1f}s)"}), 400
+            audio_seconds = requested_seconds(clipped)
+        job_cost = estimate_job_cost(audio_seconds, model_name, word_timestamps)
+        
+        # 单飞登记键：优先级或结果格式不同的请求不关联到同一任务，
+        # 否则交互请求可能排在批量队列之后，片段格式的请求可能拿到列式结果
+        claim_key = inflight_key(key, priority=priority, result_format=result_format) if key is not None else None
         
         # 初始化任务状态
         with _status_lock:
             processing_status[task_id] = {
                 "task_id": task_id,
-                "status": "processing",
-                "progress": 5,
-                "progress_text": "转录任务开始...",
+                "status": "queued",
+                "progress": 0,
+                "progress_text": "排队等待转录...",
                 "filename": filename_display,
                 "language": language,
-                "duration": duration,
+                "model": model_name,
+                "file_size": file_size,
+                "sha256": content_sha256,
+                "audio_id": audio_id,
+                "ranges": ranges,
+                "result_format": result_format,
+                "priority": priority,
+                "estimated_cost": round(job_cost, 1) if job_cost is not None else None,
+                "cache_key": key,
+                "inflight_key": claim_key,
+                "cache_hit": False,
+                "requesters": 1,  # 关联到该任务的请求数（含内容相同被关联的请求）
+                "duration": None,  # 工作线程解码后写入
                 "created_at": datetime.now().isoformat()
             }
-        save_status_to_file()
         
-        # 在后台线程中处理
-        thread = threading.Thread(
-            target=process_audio_with_progress,
-            args=(task_id, temp_file_path, whisper_language, word_timestamps)
-        )
-        thread.daemon = True
-        thread.start()
+        # 单飞：相同内容的任务正在进行时关联到该任务，不再重复解码
+        if claim_key is not None:
+            while True:
+                existing_task_id = result_cache.claim(claim_key, task_id, is_active_task)
+                existing = attach_requester(existing_task_id) if existing_task_id is not None else None
+                # 登记与关联之间该任务可能刚结束或被取消，此时它已不算进行中，重新登记
+                if existing_task_id is None or existing is not None:
+                    break
+            if existing is not None:
+                with _status_lock:
+                    processing_status.pop(task_id, None)
+                release_input()
+                logger.info(f"任务 {task_id} 与进行中的任务 {existing_task_id} 内容相同，直接关联")
+                return jsonify({
+                    "task_id": existing_task_id,
+                    "status": existing.get('status', 'queued'),
+                    "deduplicated": True,
+                    "queue_position": scheduler.position(existing_task_id),
+                    "message": "相同音频的转录任务正在进行，已关联到该任务"
+                })
+        
+        task_events.publish(task_id, 'progress', {"status": "queued", "progress": 0})
+        
+        # 提交到调度器，由固定数量的工作线程按优先级类别和估算代价（短任务优先）顺序处理
+        try:
+            queue_position = scheduler.submit(
+                task_id, process_audio_with_progress,
+                task_id, temp_file_path, whisper_language, word_timestamps, model_name, audio_id,
+                audio_duration=audio_seconds, priority=priority, cost=job_cost,
+                delete_input=input_path is None, ranges=ranges
+            )
+            input_held = False  # 输入已移交给任务，由工作线程清理
+        except (QueueFullError, SchedulerUnavailableError) as e:
+            with _status_lock:
+                processing_status.pop(task_id, None)
+            task_events.discard(task_id)
+            if claim_key is not None:
+                result_cache.release(claim_key, task_id)
+            release_input()
+            logger.warning(f"拒绝转录任务 {task_id}: {e}")
+            if isinstance(e, QueueFullError):
+                response = jsonify({"error": str(e), "queue": scheduler.stats()})
+                response.headers['Retry-After'] = str(scheduler.retry_after())
+                return response, 429
+            return jsonify({"error": str(e)}), 503
         
         # 返回任务ID
         return jsonify({
             "task_id": task_id,
-            "status": "processing",
-            "message": "转录任务已开始"
+            "status": "queued",
+            "queue_position": queue_position,
+            "message": "转录任务已加入队列"
         })
         
     except Exception as e:
+        release_input()
         error_msg = f"转录请求处理失败: {str(e)}"
         logger.error(error_msg)
         return jsonify({"error": error_msg}), 500
 
 @app.route('/stream', methods=['POST'])
 def stream_transcribe():
-    """流式转录 - 暂未实现，返回错误"""
-    return jsonify({"error": "Streaming transcription not yet implemented"}), 501
+    """流式转录 - 边接收分块上传的音频边解码，以NDJSON逐行返回片段
+    
+    请求体为原始音频字节（可使用 Transfer-Encoding: chunked），参数通过查询字符串传递：
+    language, word_timestamps, model。每行一个JSON对象：
+    {"type": "segment", ...} / {"type": "done", ...} / {"type": "error", ...}
+    注意：moov在文件末尾的m4a/mp4无法从管道流式解码，应先上传到 /inference。
+    """
+    language = request.args.get('language', 'auto')
+    word_timestamps = request.args.get('word_timestamps', 'false').lower() == 'true'
+    whisper_language = None if language in ('auto', '') else language
+    needs_simplified = whisper_language == 'zh-cn'
+    if needs_simplified:
+        whisper_language = 'zh'
+    unavailable = model_unavailable_response()
+    if unavailable:
+        return unavailable
+    try:
+        model_name = model_registry.resolve(request.args.get('model'))
+    except UnknownModelError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    input_stream = request.stream
+    decoder = FfmpegPcmDecoder()
+    decoder.feed_from(input_stream)
+    logger.info(f"流式转录开始 - 语言: {language}, 词级时间戳: {word_timestamps}")
+    
+    def generate():
+        started = time.time()
+        detected = {}
+        segment_count = 0
+        texts = []
+        
+        def on_info(info):
+            detected['language'] = info.language
+        
+        try:
+            yield json.dumps({"type": "started", "model": model_name}) + "\n"
+            with model_registry.use(model_name) as stream_model:
+                segments = transcribe_pcm_windows(
+                    stream_model, decoder.iter_pcm(), language=whisper_language,
+                    word_timestamps=word_timestamps, info_callback=on_info
+                )
+                for segment in segments:
+                    if needs_simplified or detected.get('language') == 'zh':
+                        convert_segment_to_simplified(segment)
+                    segment_count += 1
+                    texts.append(segment["text"])
+                    yield json.dumps({"type": "segment", "index": segment_count - 1, **segment}, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "type": "done",
+                "text": " ".join(texts),
+                "language": detected.get('language'),
+                "segments": segment_count,
+                "bytes_received": decoder.bytes_received,
+                "decode_seconds": round(time.time() - started, 2)
+            }, ensure_ascii=False) + "\n"
+            logger.info(f"流式转录完成 - {segment_count} 个片段, 接收 {decoder.bytes_received} 字节")
+        except Exception as e:
+            logger.error(f"流式转录失败: {e}")
+            yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+        finally:
+            decoder.close()
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+def live_transcribe(ws):
+    """实时转录 - WebSocket
+    
+    客户端发送二进制帧：16kHz 单声道 16位小端PCM；
+    文本帧 {"type": "end"} 表示输入结束。查询参数：language, min_chunk（秒）。
+    服务端返回JSON文本帧：partial（不稳定的部分结果）、final（稳定片段）、done、error。
+    """
+    language = request.args.get('language', 'auto')
+    whisper_language = None if language in ('auto', '') else language
+    needs_simplified = whisper_language == 'zh-cn'
+    if needs_simplified:
+        whisper_language = 'zh'
+    min_chunk = request.args.get('min_chunk', type=float) or 1.0
+    if model_state["status"] != "ready":
+        ws.send(json.dumps({"type": "error", "error": f"Model is not ready ({model_state['status']})"}))
+        return
+    
+    transcriber = LiveTranscriber(model, language=whisper_language, min_chunk_seconds=min_chunk)
+    transcriber.text_filter = lambda text: (
+        convert_to_simplified_chinese(text) if needs_simplified or transcriber.language == 'zh' else text
+    )
+    logger.info(f"实时转录会话开始 - 语言: {language}, 识别间隔: {min_chunk}s")
+    
+    try:
+        while True:
+            # 取出已到达的全部音频帧后再识别，识别较慢时自动合并多帧
+            message = ws.receive(timeout=None if not transcriber.ready() else 0)
+            while message is not None:
+                if isinstance(message, (bytes, bytearray)):
+                    transcriber.add_pcm16(message)
+                elif json.loads(message).get('type') == 'end':
+                    for result in transcriber.flush():
+                        ws.send(json.dumps(result, ensure_ascii=False))
+                    ws.send(json.dumps({"type": "done", "language": transcriber.language}))
+                    return
+                message = ws.receive(timeout=0)
+            if transcriber.ready():
+                for result in transcriber.process():
+                    ws.send(json.dumps(result, ensure_ascii=False))
+    except Exception as e:
+        if e.__class__.__name__ == 'ConnectionClosed':
+            logger.info("实时转录会话已断开")
+            return
+        logger.error(f"实时转录失败: {e}")
+        ws.send(json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False))
+
+if HAS_WEBSOCKET:
+    Sock(app).route('/live')(live_transcribe)
 
 if __name__ == '__main__':
+    init_services()
+    # 同机部署的调用方可以通过Unix域套接字访问，不经过TCP回环
+    if args.unix_socket:
+        from werkzeug.serving import make_server
+        unix_server = make_server(f"unix://{args.unix_socket}", 0, app, threaded=True)
+        threading.Thread(target=unix_server.serve_forever, name='unix-socket-server', daemon=True).start()
+        logger.info(f"Also serving on unix://{args.unix_socket}")
     logger.info(f"Starting Whisper service on http://127.0.0.1:{args.port}")
     app.run(host='127.0.0.1', port=args.port, debug=False) 
\ No newline at end of file
@@ -22,6 +22,8 @@ from opencc import OpenCC
 from typing import Dict, Any, Optional
 import torch
 
+from zh_convert import ChineseConverter
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -30,16 +32,20 @@ logger = logging.getLogger(__name__)
 try:
     import opencc
     HAS_OPENCC = True
-    # 创建繁体转简体的转换器
-    cc = opencc.OpenCC('t2s')  # traditional to simplified
+    # 优先使用OpenCC自带词典构建的前缀树转换器（短句缓存、跳过已是简体的文本）
+    zh_converter = ChineseConverter.from_opencc_package()
+    cc = None if zh_converter is not None else opencc.OpenCC('t2s')  # traditional to simplified
     logger.info("OpenCC库已加载，支持繁简转换")
 except ImportError:
     HAS_OPENCC = False
+    zh_converter = None
     cc = None
     logger.warning("OpenCC库未安装，无法进行繁简转换。可以通过 pip install opencc-python-reimplemented 安装")
 
 def convert_to_simplified_chinese(text: str) -> str:
     """将繁体中文转换为简体中文"""
+    if zh_converter is not None:
+        return zh_converter.convert(text)
     if HAS_OPENCC and cc and text:
         try:
             return cc.convert(text)
@@ -304,17 +310,18 @@ def create_app():
             # 5. 文本处理 (70%)
             update_task_progress(task_id, 70, 'processing', '文本处理中...')
             
-            # 合并文本
-            text = " ".join([segment["text"] for segment in processed_segments])
-            
             # 6. 繁简转换 (85%)
             update_task_progress(task_id, 85, 'processing', '繁简转换中...')
             
-            # 繁简转换
+            # 繁简转换：每个片段（及词级时间戳中的词）只转换一次，全文由转换后的片段拼接
             if language == "zh-cn" or info.language == "zh":
-                text = convert_to_simplified_chinese(text)
                 for segment in processed_segments:
                     segment["text"] = convert_to_simplified_chinese(segment["text"])
+                    for word in segment.get("words") or ():
+                        word["word"] = convert_to_simplified_chinese(word["word"])
+            
+            # 合并文本
+            text = " ".join([segment["text"] for segment in processed_segments])
             
             # 7. 完成 (100%)
             result = {
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已上传音频存储
+- POST /audio 上传一次，返回 audio_id，之后 /inference 通过 audio_id 反复转录（换模型、语言等参数）
+- 原始文件旁保存解码后的16kHz单声道float32 PCM，转录时直接内存映射，不再重复上传和解码
+- 条目在最后一次使用后 ttl 秒过期；排队或转录中的任务持有租约，不会被清理
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class AudioNotFoundError(KeyError):
+    """audio_id 不存在或已过期，应返回404"""
+
+
+class StoredAudio:
+    __slots__ = ('audio_id', 'filename', 'size', 'sha256', 'created_at', 'expires_at',
+                 'status', 'error', 'duration', 'in_use', 'deleted', 'decoded')
+
+    def __init__(self, audio_id: str, filename: str, size: int, sha256: str, created_at: float, expires_at: float):
+        self.audio_id = audio_id
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.created_at = created_at
+        self.expires_at = expires_at
+        # decoding / ready / failed
+        self.status = 'decoding'
+        self.error = None
+        self.duration = None
+        self.in_use = 0
+        # 已被 DELETE 删除，仍被任务使用时文件保留到最后一个任务结束
+        self.deleted = False
+        # 解码完成（成功或失败）时置位
+        self.decoded = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "audio_id": self.audio_id,
+            "filename": self.filename,
+            "size": self.size,
+            "sha256": self.sha256,
+            "status": self.status,
+            "error": self.error,
+            "duration": self.duration,
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+        }
+
+
+class AudioStore:
+    """audio_id -> 原始文件 + 解码后的PCM"""
+
+    def __init__(self, directory: str, ttl_seconds: float, decode_workers: int = 1):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, StoredAudio] = {}
+        # 上传后立即在后台解码，客户端准备参数期间完成
+        self._decoder = ThreadPoolExecutor(max_workers=max(1, decode_workers), thread_name_prefix='audio-decode')
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, audio_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{audio_id}{suffix}")
+
+    def source_path(self, audio_id: str) -> str:
+        return self._path(audio_id, '.audio')
+
+    def pcm_path(self, audio_id: str) -> str:
+        return self._path(audio_id, '.f32')
+
+    def _temp_path(self, audio_id: str, suffix: str) -> str:
+        """同目录下名称唯一的临时文件，写完后 os.replace 到目标，并发写入同一条目时互不覆盖"""
+        fd, temp_path = tempfile.mkstemp(prefix=f"{audio_id}{suffix}.", suffix='.tmp', dir=self.directory)
+        os.close(fd)
+        return temp_path
+
+    def _load_index(self):
+        """启动时从元数据文件恢复未过期的条目，解码未完成的重新解码"""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                # 上次运行中断时未完成的临时文件
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                continue
+            if not name.endswith('.json'):
+                continue
+            audio_id = name[:-5]
+            try:
+                with open(self._path(audio_id, '.json'), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                entry = StoredAudio(audio_id, meta['filename'], meta['size'], meta['sha256'],
+                                    meta['created_at'], meta['expires_at'])
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"读取音频元数据失败 {audio_id}: {e}")
+                self._remove_files(audio_id)
+                continue
+            if entry.expires_at <= now or not os.path.exists(self.source_path(audio_id)):
+                self._remove_files(audio_id)
+                continue
+            self._entries[audio_id] = entry
+            if os.path.exists(self.pcm_path(audio_id)):
+                self._mark_decoded(entry)
+            else:
+                self._decoder.submit(self._decode, entry)
+        if self._entries:
+            logger.info(f"已上传音频: 恢复 {len(self._entries)} 条")
+
+    def add(self, upload_path: str, filename: str, size: int, sha256: str) -> StoredAudio:
+        """接管上传的临时文件并开始后台解码"""
+        audio_id = f"audio_{uuid.uuid4().hex}"
+        now = time.time()
+        entry = StoredAudio(audio_id, filename, size, sha256, now, now + self.ttl_seconds)
+        shutil.move(upload_path, self.source_path(audio_id))
+        self._write_meta(entry)
+        with self._lock:
+            self._entries[audio_id] = entry
+        self._decoder.submit(self._decode, entry)
+        return entry
+
+    def _write_meta(self, entry: StoredAudio):
+        meta = {key: value for key, value in entry.to_dict().items()
+                if key in ('filename', 'size', 'sha256', 'created_at', 'expires_at')}
+        path = self._path(entry.audio_id, '.json')
+        temp_path = self._temp_path(entry.audio_id, '.json')
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def _decode(self, entry: StoredAudio):
+        """ffmpeg解码为PCM文件（先写临时文件，完成后重命名）"""
+        pcm_path = self.pcm_path(entry.audio_id)
+        temp_path = self._temp_path(entry.audio_id, '.f32')
+        started = time.time()
+        command = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', self.source_path(entry.audio_id),
+                   '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), temp_path]
+        try:
+            result = subprocess.run(command, capture_output=True)
+            if result.returncode != 0:
+                stderr = result.stderr.decode('utf-8', errors='replace').strip()
+                raise RuntimeError(f"ffmpeg decode failed: {stderr or result.returncode}")
+            os.replace(temp_path, pcm_path)
+            self._mark_decoded(entry)
+            logger.info(f"音频 {entry.audio_id} 解码完成: {entry.duration:.1f}s，耗时 {time.time() - started:.1f}s")
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            entry.status, entry.error = 'failed', str(e)
+            entry.decoded.set()
+            logger.warning(f"音频 {entry.audio_id} 解码失败: {e}")
+
+    def _mark_decoded(self, entry: StoredAudio):
+        entry.duration = os.path.getsize(self.pcm_path(entry.audio_id)) / 4 / SAMPLE_RATE
+        entry.status = 'ready'
+        entry.decoded.set()
+
+    def _lookup(self, audio_id: str, leased: bool = False) -> StoredAudio:
+        """取条目（需持有锁）；已删除或已过期且空闲的条目视为不存在，leased 为真时调用方持有租约"""
+        entry = self._entries.get(audio_id)
+        if entry is None:
+            raise AudioNotFoundError(audio_id)
+        if leased and entry.in_use:
+            return entry
+        if entry.deleted or (entry.expires_at <= time.time() and not entry.in_use):
+            raise AudioNotFoundError(audio_id)
+        return entry
+
+    def get(self, audio_id: str) -> StoredAudio:
+        with self._lock:
+            return self._lookup(audio_id)
+
+    def acquire(self, audio_id: str) -> StoredAudio:
+        """任务提交时持有条目并顺延过期时间，任务结束后调用 release"""
+        with self._lock:
+            entry = self._lookup(audio_id)
+            entry.in_use += 1
+            entry.expires_at = max(entry.expires_at, time.time() + self.ttl_seconds)
+        return entry
+
+    def release(self, audio_id: str):
+        with self._lock:
+            entry = self._entries.get(audio_id)
+            if entry is None:
+                return
+            entry.in_use -= 1
+            if entry.deleted:
+                # 使用中被删除：最后一个任务结束时删除条目和文件，不再顺延过期时间
+                if entry.in_use:
+                    return
+                del self._entries[audio_id]
+            else:
+                entry.expires_at = max(entry.expires_at, time.time() + self.ttl_seconds)
+        if entry.deleted:
+            entry.decoded.wait()
+            self._remove_files(audio_id)
+            return
+        try:
+            self._write_meta(entry)
+        except OSError as e:
+            logger.debug(f"更新音频元数据失败 {audio_id}: {e}")
+
+    def samples(self, audio_id: str, timeout: Optional[float] = None) -> np.ndarray:
+        """等待解码完成，返回只读内存映射的PCM采样（调用方持有租约，条目已被删除时仍可读取）"""
+        with self._lock:
+            entry = self._lookup(audio_id, leased=True)
+        if not entry.decoded.wait(timeout):
+            raise TimeoutError(f"Audio {audio_id} is still decoding")
+        if entry.status != 'ready':
+            raise RuntimeError(f"Audio {audio_id} could not be decoded: {entry.error}")
+        pcm_path = self.pcm_path(audio_id)
+        num_samples = os.path.getsize(pcm_path) // 4
+        if num_samples == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(pcm_path, dtype=np.float32, mode='r', shape=(num_samples,))
+
+    def delete(self, audio_id: str) -> bool:
+        """删除条目；仍被任务使用时只标记删除，最后一个任务 release 时删除文件"""
+        with self._lock:
+            entry = self._entries.get(audio_id)
+            if entry is None or entry.deleted:
+                return False
+            entry.deleted = True
+            entry.expires_at = 0
+            in_use = entry.in_use
+            if not in_use:
+                del self._entries[audio_id]
+        if in_use:
+            # 记录已过期，任务结束前进程重启时启动清理会删除文件
+            try:
+                self._write_meta(entry)
+            except OSError as e:
+                logger.debug(f"更新音频元数据失败 {audio_id}: {e}")
+            return True
+        entry.decoded.wait()
+        self._remove_files(audio_id)
+        return True
+
+    def purge_expired(self) -> List[str]:
+        """删除过期且空闲（解码已结束）的条目"""
+        now = time.time()
+        with self._lock:
+            expired = [audio_id for audio_id, entry in self._entries.items()
+                       if entry.expires_at <= now and not entry.in_use and entry.decoded.is_set()]
+            for audio_id in expired:
+                del self._entries[audio_id]
+        for audio_id in expired:
+            self._remove_files(audio_id)
+        return expired
+
+    def _remove_files(self, audio_id: str):
+        # 已映射PCM的任务在POSIX下不受删除影响
+        for suffix in ('.json', '.audio', '.f32'):
+            path = self._path(audio_id, suffix)
+            try:
+                if os.path.exists(path):
+                    os.unlink(path)
+            except OSError as e:
+                logger.warning(f"删除音频文件失败 {path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._entries.values())
+        disk_bytes = 0
+        for entry in entries:
+            for path in (self.source_path(entry.audio_id), self.pcm_path(entry.audio_id)):
+                try:
+                    disk_bytes += os.path.getsize(path)
+                except OSError:
+                    pass
+        return {
+            "entries": len(entries),
+            "decoding": sum(1 for entry in entries if entry.status == 'decoding'),
+            "in_use": sum(1 for entry in entries if entry.in_use),
+            "disk_mb": round(disk_bytes / 2**20, 2),
+            "ttl_seconds": self.ttl_seconds,
+        }
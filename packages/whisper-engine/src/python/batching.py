@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨请求微批处理
+把并发任务中不超过30秒的音频窗口在很短的时间预算内收集起来，
+对CTranslate2一次性执行编码(encode)、语言检测和解码(generate)，再把结果分发回各任务。
+
+只覆盖单窗口、无词级时间戳的场景；没有温度回退，其余情况仍走 model.transcribe。
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+# 与 faster-whisper 默认值一致
+NO_SPEECH_THRESHOLD = 0.6
+LOG_PROB_THRESHOLD = -1.0
+MAX_INITIAL_TIMESTAMP = 1.0
+
+
+class BatchItem:
+    __slots__ = ('audio', 'language', 'future', 'submitted_at')
+
+    def __init__(self, audio: np.ndarray, language: Optional[str]):
+        self.audio = audio
+        self.language = language
+        self.future: Future = Future()
+        self.submitted_at = time.time()
+
+
+class MicroBatcher:
+    """在 max_wait_ms 内收集最多 max_batch_size 个窗口，合并成一个批次推理"""
+
+    def __init__(self, model, max_batch_size: int = 8, max_wait_ms: float = 50, beam_size: int = 5):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.beam_size = beam_size
+        self._pending: List[BatchItem] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        # 吞吐统计
+        self._batches = 0
+        self._items = 0
+        self._audio_seconds = 0.0
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._max_batch_seen = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='whisper-batcher')
+            self._thread.daemon = True
+            self._thread.start()
+        logger.info(f"微批处理已启动: batch_size={self.max_batch_size}, max_wait={self.max_wait * 1000:.0f}ms")
+
+    def submit(self, audio: np.ndarray, language: Optional[str] = None) -> Future:
+        """提交不超过30秒的音频，Future结果为 {"segments", "language", "language_probability", "duration"}"""
+        if len(audio) > WINDOW_SECONDS * SAMPLE_RATE:
+            raise ValueError("Batched inference only accepts audio up to 30 seconds")
+        item = BatchItem(audio, language)
+        with self._cond:
+            self._pending.append(item)
+            self._cond.notify()
+        return item.future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "pending": len(self._pending),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else None,
+                "max_batch_seen": self._max_batch_seen,
+                "avg_queue_wait_ms": round(self._wait_seconds / self._items * 1000, 1) if self._items else None,
+                "audio_seconds": round(self._audio_seconds, 1),
+                "busy_seconds": round(self._busy_seconds, 2),
+                "audio_seconds_per_busy_second": (
+                    round(self._audio_seconds / self._busy_seconds, 2) if self._busy_seconds else None
+                ),
+            }
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # 第一个窗口到达后最多再等待 max_wait 收集更多窗口
+                deadline = self._pending[0].submitted_at + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+
+            started = time.time()
+            try:
+                results = self._run_batch(batch)
+            except Exception as e:
+                logger.error(f"批处理推理失败 ({len(batch)} 个窗口): {e}", exc_info=True)
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            elapsed = time.time() - started
+            with self._cond:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+                self._busy_seconds += elapsed
+                self._audio_seconds += sum(len(item.audio) for item in batch) / SAMPLE_RATE
+                self._wait_seconds += sum(started - item.submitted_at for item in batch)
+            for item, result in zip(batch, results):
+                item.future.set_result(result)
+
+    def _run_batch(self, batch: List[BatchItem]) -> List[Dict[str, Any]]:
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import get_ctranslate2_storage
+
+        model = self.model
+        extractor = model.feature_extractor
+        features = np.stack([
+            pad_or_trim(extractor(item.audio), extractor.nb_max_frames)
+            for item in batch
+        ])
+        encoder_output = model.model.encode(get_ctranslate2_storage(features))
+
+        # 未指定语言的窗口使用同一次编码结果做语言检测
+        languages = [(item.language, 1.0) for item in batch]
+        if any(language is None for language, _ in languages):
+            if model.model.is_multilingual:
+                detected = model.model.detect_language(encoder_output)
+                languages = [
+                    (language, 1.0) if language else (detected[i][0][0][2:-2], detected[i][0][1])
+                    for i, (language, _) in enumerate(languages)
+                ]
+            else:
+                languages = [(language or 'en', 1.0) for language, _ in languages]
+
+        tokenizers = [
+            Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task='transcribe', language=language)
+            for language, _ in languages
+        ]
+        prompts = [model.get_prompt(tokenizer, []) for tokenizer in tokenizers]
+        generated = model.model.generate(
+            encoder_output,
+            prompts,
+            beam_size=self.beam_size,
+            max_length=model.max_length,
+            return_scores=True,
+            return_no_speech_prob=True,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+            max_initial_timestamp_index=int(round(MAX_INITIAL_TIMESTAMP / model.time_precision)),
+        )
+
+        results = []
+        for item, tokenizer, (language, probability), result in zip(batch, tokenizers, languages, generated):
+            duration = len(item.audio) / SAMPLE_RATE
+            tokens = result.sequences_ids[0]
+            avg_logprob = result.scores[0] * len(tokens) / (len(tokens) + 1)
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOG_PROB_THRESHOLD:
+                segments = []  # 静音
+            else:
+                segments = self._split_segments(tokens, tokenizer, duration)
+            results.append({
+                "segments": segments,
+                "language": language,
+                "language_probability": probability,
+                "duration": duration,
+            })
+        return results
+
+    def _split_segments(self, tokens: List[int], tokenizer, duration: float) -> List[Dict[str, Any]]:
+        """按时间戳token切分片段：<|t0|> 文本 <|t1|><|t1|> 文本 <|t2|> ..."""
+        time_precision = self.model.time_precision
+        segments = []
+        start = None
+        text_tokens: List[int] = []
+        for token in tokens:
+            if token < tokenizer.timestamp_begin:
+                if token < tokenizer.eot:
+                    text_tokens.append(token)
+                continue
+            timestamp = min((token - tokenizer.timestamp_begin) * time_precision, duration)
+            if start is not None and text_tokens:
+                segments.append({"start": start, "end": timestamp, "text": tokenizer.decode(text_tokens)})
+                text_tokens = []
+                start = None
+            else:
+                start = timestamp
+        if text_tokens:
+            segments.append({
+                "start": start if start is not None else 0.0,
+                "end": duration,
+                "text": tokenizer.decode(text_tokens)
+            })
+        return segments
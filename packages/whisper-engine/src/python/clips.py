@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间范围（片段）转录
+只解码和转录请求的时间范围（如预览前5分钟、重新识别被标记的段落），
+耗时与请求的时长成正比；输出的时间戳是相对于整个录音的绝对时间。
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from streaming import transcribe_pcm_windows
+
+# (开始秒, 结束秒)，结束为None表示到录音结尾
+Range = Tuple[float, Optional[float]]
+
+# 单个请求允许的最大范围数
+MAX_RANGES = 100
+
+
+class ClipRangeError(ValueError):
+    """时间范围参数无效，应返回400"""
+
+
+def _parse_seconds(value: Any, name: str) -> float:
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise ClipRangeError(f"{name} must be a number of seconds")
+    if not np.isfinite(seconds) or seconds < 0:
+        raise ClipRangeError(f"{name} must be a non-negative number of seconds")
+    return seconds
+
+
+def parse_ranges(start: Optional[str] = None, end: Optional[str] = None,
+                 ranges: Optional[str] = None) -> Optional[List[Range]]:
+    """解析请求中的 start/end 或 ranges 参数，返回按时间排序并合并重叠后的范围列表
+
+    ranges 为JSON数组 [[0, 300], [600, 900]]，或逗号分隔的 "0-300,600-900"（结束可省略，如 "600-"）。
+    未指定任何范围时返回None，表示转录整个文件。
+    """
+    if ranges and (start or end):
+        raise ClipRangeError("Use either start/end or ranges, not both")
+    if not ranges:
+        if not start and not end:
+            return None
+        parsed = [(_parse_seconds(start or 0, 'start'), _parse_seconds(end, 'end') if end else None)]
+    else:
+        try:
+            items = json.loads(ranges)
+        except ValueError:
+            items = [item.split('-', 1) for item in ranges.split(',') if item.strip()]
+        if not isinstance(items, list) or not items:
+            raise ClipRangeError("ranges must be a non-empty list of [start, end] pairs")
+        if len(items) > MAX_RANGES:
+            raise ClipRangeError(f"At most {MAX_RANGES} ranges are allowed")
+        parsed = []
+        for item in items:
+            if not isinstance(item, (list, tuple)) or len(item) != 2:
+                raise ClipRangeError("Each range must be a [start, end] pair")
+            range_start, range_end = item
+            parsed.append((_parse_seconds(range_start, 'start'),
+                           None if range_end in (None, '') else _parse_seconds(range_end, 'end')))
+
+    for range_start, range_end in parsed:
+        if range_end is not None and range_end <= range_start:
+            raise ClipRangeError(f"Range end must be after its start: {range_start}-{range_end}")
+
+    merged: List[Range] = []
+    for range_start, range_end in sorted(parsed, key=lambda r: r[0]):
+        if merged:
+            last_start, last_end = merged[-1]
+            if last_end is None:
+                break  # 上一个范围已到结尾，覆盖后面所有范围
+            if range_start <= last_end:
+                merged[-1] = (last_start, None if range_end is None else max(last_end, range_end))
+                continue
+        merged.append((range_start, range_end))
+    return merged
+
+
+def clip_ranges(ranges: List[Range], duration: Optional[float]) -> List[Range]:
+    """按录音时长截断范围，丢弃完全超出结尾的范围；时长未知时原样返回"""
+    if not duration:
+        return ranges
+    clipped = []
+    for range_start, range_end in ranges:
+        if range_start >= duration:
+            break
+        clipped.append((range_start, duration if range_end is None else min(range_end, duration)))
+    return clipped
+
+
+def requested_seconds(ranges: List[Range]) -> Optional[float]:
+    """请求的总时长，存在开放结尾的范围时为None"""
+    if any(range_end is None for _, range_end in ranges):
+        return None
+    return sum(range_end - range_start for range_start, range_end in ranges)
+
+
+def requested_position(ranges: List[Range], timestamp: float) -> float:
+    """绝对时间戳对应的已处理请求时长，用于进度计算"""
+    position = 0.0
+    for range_start, range_end in ranges:
+        if timestamp <= range_start:
+            break
+        position += (timestamp if range_end is None else min(timestamp, range_end)) - range_start
+    return position
+
+
+def slice_samples(samples: np.ndarray, range_start: float, range_end: Optional[float],
+                  sample_rate: int) -> np.ndarray:
+    """已解码采样中对应时间范围的部分（内存映射时不复制）"""
+    end_index = None if range_end is None else int(range_end * sample_rate)
+    return samples[int(range_start * sample_rate):end_index]
+
+
+def ffmpeg_range_args(range_start: float, range_end: Optional[float]) -> List[str]:
+    """ffmpeg输入端定位参数：-ss 放在 -i 前按索引快速定位，只解码请求的范围"""
+    args = ['-ss', f"{range_start:.3f}"]
+    if range_end is not None:
+        args += ['-t', f"{range_end - range_start:.3f}"]
+    return args
+
+
+def transcribe_ranges(model, open_range: Callable[[float, Optional[float]], Iterable[np.ndarray]],
+                      ranges: List[Range], language: Optional[str] = None, word_timestamps: bool = False,
+                      info_callback=None, **transcribe_options) -> Iterator[Dict[str, Any]]:
+    """依次转录各个范围，逐个产出带绝对时间戳的片段字典
+
+    open_range(start, end) 返回该范围的PCM块迭代器；未指定语言时由第一个范围检测，后续范围沿用。
+    """
+    detected = {"language": language}
+
+    def on_info(info):
+        detected["language"] = detected["language"] or info.language
+        if info_callback is not None:
+            info_callback(info)
+
+    for index, (range_start, range_end) in enumerate(ranges):
+        yield from transcribe_pcm_windows(
+            model, open_range(range_start, range_end), language=detected["language"],
+            word_timestamps=word_timestamps, start_offset=range_start,
+            info_callback=on_info if index == 0 or detected["language"] is None else None,
+            **transcribe_options
+        )
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式转录结果
+每个片段、每个词一个字典的结果在长录音中有十万级小对象，内存和JSON体积都很大。
+列式格式把它们换成并行数组：时间为整数毫秒，概率为整数千分比，文本为一个字符串加偏移量。
+内存中的数组为 array.array（每个元素4字节，而不是每个整数一个对象），序列化时用 json_default 转为列表。
+文本偏移量以UTF-16码元计（版本2起），与 JavaScript 的 String.prototype.slice 一致；
+版本1的偏移量为Unicode码点，两者只在含BMP以外字符（如emoji）的文本中不同。
+
+    {
+      "format": "columnar", "version": 2, "language": "zh", "duration": 7200.0,
+      "text": "<全文，片段之间以空格分隔>",
+      "segments": {"count": n, "start_ms": [...], "end_ms": [...],
+                   "text_start": [...], "text_end": [...],      # 片段在 text 中的范围
+                   "word_count": [...]},                        # 仅有词级时间戳时
+      "words": {"count": m, "start_ms": [...], "end_ms": [...], "probability_permille": [...],
+                "text": "<所有词拼接>", "text_offsets": [0, ...]}  # 第i个词为 text[offsets[i]:offsets[i+1]]
+    }
+"""
+
+from array import array
+from typing import Any, Dict
+
+COLUMNAR_FORMAT = 'columnar'
+COLUMNAR_VERSION = 2
+
+# 结果中除片段外原样保留的字段
+_PASSTHROUGH_KEYS = ('language', 'duration', 'ranges')
+
+
+def _ms(seconds: float) -> int:
+    return int(round(seconds * 1000))
+
+
+def _utf16_len(text: str) -> int:
+    """UTF-16码元数：BMP以外的字符占两个"""
+    return len(text) if text.isascii() else len(text.encode('utf-16-le')) // 2
+
+
+def _text_slicer(text: str, version: int):
+    """按偏移量取子串的函数，版本2起偏移量为UTF-16码元"""
+    if version < 2 or text.isascii():
+        return lambda start, end: text[start:end]
+    data = text.encode('utf-16-le')
+    return lambda start, end: data[start * 2:end * 2].decode('utf-16-le')
+
+
+def json_default(value: Any):
+    """json.dumps / msgpack 的 default：紧凑数组转为列表"""
+    if isinstance(value, array):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def is_columnar(result: Any) -> bool:
+    return isinstance(result, dict) and result.get('format') == COLUMNAR_FORMAT
+
+
+def to_columnar(result: Dict[str, Any]) -> Dict[str, Any]:
+    """片段字典列表形式的结果转为列式"""
+    if is_columnar(result):
+        return result
+    segments = result.get('segments') or []
+    segment_start, segment_end, text_start, text_end, word_count = (array('i') for _ in range(5))
+    word_start, word_end, word_probability, word_offsets = array('i'), array('i'), array('h'), array('i', [0])
+    word_texts = []
+    position = 0
+    for index, segment in enumerate(segments):
+        if index:
+            position += 1  # 片段之间的空格
+        segment_start.append(_ms(segment['start']))
+        segment_end.append(_ms(segment['end']))
+        text_start.append(position)
+        position += _utf16_len(segment['text'])
+        text_end.append(position)
+        words = segment.get('words') or []
+        word_count.append(len(words))
+        for word in words:
+            word_start.append(_ms(word['start']))
+            word_end.append(_ms(word['end']))
+            word_probability.append(int(round(word.get('probability', 0.0) * 1000)))
+            word_texts.append(word['word'])
+            word_offsets.append(word_offsets[-1] + _utf16_len(word['word']))
+
+    columnar = {"format": COLUMNAR_FORMAT, "version": COLUMNAR_VERSION}
+    columnar.update({key: result[key] for key in _PASSTHROUGH_KEYS if key in result})
+    columnar["text"] = " ".join(segment['text'] for segment in segments)
+    columnar["segments"] = {
+        "count": len(segments),
+        "start_ms": segment_start,
+        "end_ms": segment_end,
+        "text_start": text_start,
+        "text_end": text_end,
+    }
+    if word_texts:
+        columnar["segments"]["word_count"] = word_count
+        columnar["words"] = {
+            "count": len(word_texts),
+            "start_ms": word_start,
+            "end_ms": word_end,
+            "probability_permille": word_probability,
+            "text": "".join(word_texts),
+            "text_offsets": word_offsets,
+        }
+    return columnar
+
+
+def from_columnar(columnar: Dict[str, Any]) -> Dict[str, Any]:
+    """列式结果还原为片段字典列表形式（时间精度为毫秒）"""
+    if not is_columnar(columnar):
+        return columnar
+    text = columnar["text"]
+    version = columnar.get("version", 1)
+    segment_text = _text_slicer(text, version)
+    segments_data = columnar["segments"]
+    words_data = columnar.get("words")
+    word_text = _text_slicer(words_data["text"], version) if words_data else None
+    segments = []
+    word_index = 0
+    for i in range(segments_data["count"]):
+        segment = {
+            "start": segments_data["start_ms"][i] / 1000,
+            "end": segments_data["end_ms"][i] / 1000,
+            "text": segment_text(segments_data["text_start"][i], segments_data["text_end"][i]),
+        }
+        if words_data:
+            words = []
+            for _ in range(segments_data["word_count"][i]):
+                offsets = words_data["text_offsets"]
+                words.append({
+                    "word": word_text(offsets[word_index], offsets[word_index + 1]),
+                    "start": words_data["start_ms"][word_index] / 1000,
+                    "end": words_data["end_ms"][word_index] / 1000,
+                    "probability": words_data["probability_permille"][word_index] / 1000,
+                })
+                word_index += 1
+            segment["words"] = words
+        segments.append(segment)
+    result = {"text": text}
+    result.update({key: columnar[key] for key in _PASSTHROUGH_KEYS if key in columnar})
+    result["segments"] = segments
+    return result
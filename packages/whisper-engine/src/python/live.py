@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时转录
+对持续到达的16kHz PCM做滚动窗口解码：
+- 每积累 min_chunk_seconds 的新音频就重新识别一次缓冲区，输出不稳定的部分结果(partial)
+- LocalAgreement-2：连续两次识别结果的最长公共前缀视为稳定，提交为最终片段(final)
+- 已提交文本作为下一次识别的提示词，已提交的音频从缓冲区中裁掉
+"""
+
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+MIN_CHUNK_SECONDS = 1.0
+# 缓冲区超过该长度时裁剪到最后一个已提交词
+BUFFER_TRIM_SECONDS = 15.0
+PROMPT_CHARS = 200
+
+_NORMALIZE_PATTERN = re.compile(r"[^\w]+", re.UNICODE)
+
+# (start, end, text) —— 绝对时间
+Word = Tuple[float, float, str]
+
+
+def _normalize(text: str) -> str:
+    return _NORMALIZE_PATTERN.sub('', text).lower()
+
+
+class LiveTranscriber:
+    """单个实时会话的识别状态"""
+
+    def __init__(self, model, language: Optional[str] = None, min_chunk_seconds: float = MIN_CHUNK_SECONDS,
+                 buffer_trim_seconds: float = BUFFER_TRIM_SECONDS, beam_size: int = 1,
+                 text_filter: Optional[Callable[[str], str]] = None):
+        self.model = model
+        self.language = language
+        self.min_chunk_samples = int(min_chunk_seconds * SAMPLE_RATE)
+        self.buffer_trim_seconds = buffer_trim_seconds
+        self.beam_size = beam_size
+        self.text_filter = text_filter or (lambda text: text)
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_offset = 0.0  # buffer[0] 对应的绝对时间（秒）
+        self.received_samples = 0
+        self._unprocessed_samples = 0
+        self.committed: List[Word] = []
+        self.committed_until = 0.0
+        self._previous_hypothesis: List[Word] = []
+
+    def add_pcm16(self, data: bytes):
+        """追加16位小端PCM"""
+        usable = len(data) - len(data) % 2
+        audio = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32) / 32768.0
+        self.buffer = np.concatenate([self.buffer, audio])
+        self.received_samples += len(audio)
+        self._unprocessed_samples += len(audio)
+
+    def ready(self) -> bool:
+        return self._unprocessed_samples >= self.min_chunk_samples
+
+    def process(self) -> List[Dict[str, Any]]:
+        """识别当前缓冲区，返回需要发送给客户端的消息"""
+        self._unprocessed_samples = 0
+        if not len(self.buffer):
+            return []
+        started = time.time()
+        hypothesis = self._transcribe()
+        messages = []
+
+        # LocalAgreement-2：与上一次结果的公共前缀稳定下来
+        agreed = 0
+        for current, previous in zip(hypothesis, self._previous_hypothesis):
+            if _normalize(current[2]) != _normalize(previous[2]):
+                break
+            agreed += 1
+        stable, unstable = hypothesis[:agreed], hypothesis[agreed:]
+        buffer_end = self.buffer_offset + len(self.buffer) / SAMPLE_RATE
+        if len(self.buffer) / SAMPLE_RATE > 2 * self.buffer_trim_seconds:
+            # 长时间没有达成一致时，强制提交距缓冲区末尾较远的词，避免缓冲区无限增长
+            forced = [word for word in unstable if word[1] < buffer_end - 2 * MIN_CHUNK_SECONDS]
+            stable, unstable = stable + forced, unstable[len(forced):]
+        self._previous_hypothesis = unstable
+
+        if stable:
+            messages.append(self._commit(stable))
+        if unstable:
+            messages.append({
+                "type": "partial",
+                "start": round(unstable[0][0], 3),
+                "end": round(unstable[-1][1], 3),
+                "text": self.text_filter(''.join(word[2] for word in unstable)),
+            })
+        for message in messages:
+            message["audio_received"] = round(self.received_samples / SAMPLE_RATE, 3)
+            message["decode_seconds"] = round(time.time() - started, 3)
+        self._trim_buffer()
+        return messages
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """输入结束：识别剩余音频并全部提交"""
+        if not len(self.buffer):
+            return []
+        hypothesis = self._transcribe()
+        self._previous_hypothesis = []
+        return [self._commit(hypothesis)] if hypothesis else []
+
+    def _commit(self, words: List[Word]) -> Dict[str, Any]:
+        self.committed.extend(words)
+        self.committed_until = words[-1][1]
+        return {
+            "type": "final",
+            "start": round(words[0][0], 3),
+            "end": round(words[-1][1], 3),
+            "text": self.text_filter(''.join(word[2] for word in words)),
+        }
+
+    def _committed_text(self) -> str:
+        return ''.join(word[2] for word in self.committed)
+
+    def _transcribe(self) -> List[Word]:
+        """识别缓冲区，只返回尚未提交的词"""
+        options = {}
+        prompt = self._committed_text()[-PROMPT_CHARS:]
+        if prompt:
+            options['initial_prompt'] = prompt
+        segments, info = self.model.transcribe(
+            self.buffer, language=self.language, beam_size=self.beam_size,
+            word_timestamps=True, condition_on_previous_text=False, **options
+        )
+        if self.language is None:
+            self.language = info.language
+        words = []
+        for segment in segments:
+            for word in segment.words or []:
+                start = word.start + self.buffer_offset
+                end = word.end + self.buffer_offset
+                if end <= self.committed_until + 0.01:
+                    continue
+                words.append((start, end, word.word))
+        return words
+
+    def _trim_buffer(self):
+        """缓冲区过长时丢弃已提交词之前的音频"""
+        if len(self.buffer) / SAMPLE_RATE < self.buffer_trim_seconds:
+            return
+        cut = int((self.committed_until - self.buffer_offset) * SAMPLE_RATE)
+        if cut <= 0 and not self._previous_hypothesis:
+            # 缓冲区中没有识别出任何词（静音），只保留末尾部分
+            cut = len(self.buffer) - int(self.buffer_trim_seconds / 2 * SAMPLE_RATE)
+        if cut <= 0:
+            return
+        cut = min(cut, len(self.buffer))
+        self.buffer = self.buffer[cut:]
+        self.buffer_offset += cut / SAMPLE_RATE
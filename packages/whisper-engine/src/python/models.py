@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型注册表
+- 按名称懒加载 WhisperModel，只允许配置中列出的模型
+- 常驻内存总量超过预算时淘汰最久未使用且空闲的模型
+- 使用中的模型通过租约(use)计数，不会在转录途中被淘汰
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# 相对 small 的CPU推理代价，按模型名称（或路径最后一级）中的关键字匹配，先匹配先用
+MODEL_COST_FACTORS = (
+    ('turbo', 2.0),
+    ('distil', 2.0),
+    ('large', 5.0),
+    ('medium', 2.5),
+    ('small', 1.0),
+    ('base', 0.5),
+    ('tiny', 0.3),
+)
+
+
+class UnknownModelError(ValueError):
+    """请求了未配置的模型，应返回400"""
+
+
+def model_cost_factor(name: str) -> float:
+    """模型的相对推理代价，用于调度时估算任务代价；无法识别的模型按 small 计"""
+    basename = os.path.basename(os.path.normpath(name)).lower()
+    for keyword, factor in MODEL_COST_FACTORS:
+        if keyword in basename:
+            return factor
+    return 1.0
+
+
+def _resident_bytes() -> int:
+    """当前进程常驻内存（Linux），不可用时返回0"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _model_files_bytes(path: str) -> int:
+    """本地模型目录中权重文件的大小"""
+    weights = os.path.join(path, 'model.bin')
+    return os.path.getsize(weights) if os.path.isfile(weights) else 0
+
+
+class LoadedModel:
+    __slots__ = ('name', 'model', 'memory_bytes', 'loaded_at', 'last_used', 'in_use', 'uses')
+
+    def __init__(self, name: str, model: Any, memory_bytes: int):
+        self.name = name
+        self.model = model
+        self.memory_bytes = memory_bytes
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.in_use = 0
+        self.uses = 0
+
+
+class ModelRegistry:
+    """懒加载 + LRU淘汰的模型集合"""
+
+    def __init__(self, loader: Callable[[str], Any], allowed: Iterable[str], default: str,
+                 memory_budget_bytes: int = 0):
+        self.loader = loader
+        self.default = default
+        self.allowed = list(dict.fromkeys([default, *allowed]))
+        self.memory_budget_bytes = memory_budget_bytes
+        self._models: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 同一时间只加载一个模型，内存增量测量才准确
+        self._load_lock = threading.Lock()
+        self._evictions = 0
+
+    def resolve(self, name: Optional[str]) -> str:
+        """请求参数转为模型名称，空值使用默认模型"""
+        name = (name or '').strip() or self.default
+        if name not in self.allowed:
+            raise UnknownModelError(f"Unknown model '{name}', available: {', '.join(self.allowed)}")
+        return name
+
+    def get(self, name: Optional[str] = None) -> Any:
+        """获取模型（必要时加载），不持有租约，只用于默认模型等不会被淘汰的场景"""
+        with self.use(name) as model:
+            return model
+
+    @contextmanager
+    def use(self, name: Optional[str] = None) -> Iterator[Any]:
+        """在with块内持有模型，期间不会被淘汰"""
+        entry = self._acquire(self.resolve(name))
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+            self._evict_over_budget()
+
+    def _acquire(self, name: str) -> LoadedModel:
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._mark_used(entry)
+                return entry
+
+        with self._load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    self._mark_used(entry)
+                    return entry
+            logger.info(f"加载模型 '{name}'...")
+            started = time.time()
+            before = _resident_bytes()
+            model = self.loader(name)
+            memory_bytes = max(_resident_bytes() - before, _model_files_bytes(name))
+            entry = LoadedModel(name, model, memory_bytes)
+            with self._lock:
+                self._models[name] = entry
+                self._mark_used(entry)
+            logger.info(f"模型 '{name}' 加载完成，耗时 {time.time() - started:.1f}s，约 {memory_bytes / 2**20:.0f} MB")
+        self._evict_over_budget()
+        return entry
+
+    def _mark_used(self, entry: LoadedModel):
+        entry.in_use += 1
+        entry.uses += 1
+        entry.last_used = time.time()
+        self._models.move_to_end(entry.name)
+
+    def _evict_over_budget(self):
+        """超出内存预算时按LRU顺序淘汰空闲模型，默认模型常驻"""
+        if not self.memory_budget_bytes:
+            return
+        with self._lock:
+            total = sum(entry.memory_bytes for entry in self._models.values())
+            for name in list(self._models):
+                if total <= self.memory_budget_bytes:
+                    break
+                entry = self._models[name]
+                if name == self.default or entry.in_use:
+                    continue
+                del self._models[name]
+                total -= entry.memory_bytes
+                self._evictions += 1
+                logger.info(f"内存超出预算，卸载模型 '{name}'")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = [{
+                "name": entry.name,
+                "memory_mb": round(entry.memory_bytes / 2**20, 1),
+                "in_use": entry.in_use,
+                "uses": entry.uses,
+                "loaded_at": entry.loaded_at,
+                "last_used": entry.last_used,
+            } for entry in reversed(self._models.values())]
+            return {
+                "default": self.default,
+                "available": self.allowed,
+                "loaded": loaded,
+                "memory_mb": round(sum(entry.memory_bytes for entry in self._models.values()) / 2**20, 1),
+                "memory_budget_mb": round(self.memory_budget_bytes / 2**20) if self.memory_budget_bytes else None,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长音频多进程并行转录
+- 在目标块长附近能量最低处（静音）切分音频，块之间不重叠
+- 进程池中每个进程持有独立的模型实例，CPU线程数固定并绑定到各自的核心
+- 按块顺序拼接结果，片段时间加上块偏移，丢弃块边界处重复的片段
+
+接口与 model.transcribe 一致，返回 (segments生成器, info)。
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+CHUNK_SECONDS = 180
+# 在目标切分点前后该范围内寻找静音
+SEARCH_SECONDS = 15
+ENERGY_FRAME_SECONDS = 0.1
+# 能量平滑窗口，优先选择持续的静音而不是单个安静帧
+ENERGY_SMOOTH_FRAMES = 5
+# 边界去重：与上一片段重叠超过该秒数且文本相同则丢弃
+DEDUP_TOLERANCE_SECONDS = 0.5
+
+ParallelInfo = namedtuple('ParallelInfo', ['language', 'language_probability', 'duration'])
+
+_NORMALIZE_PATTERN = re.compile(r"[^\w]+", re.UNICODE)
+
+# 工作进程内的模型实例
+_worker_model = None
+
+
+def _init_worker(model_path: str, cpu_threads: int, compute_type: str, slot_counter):
+    """工作进程初始化：绑定CPU核心并加载模型"""
+    global _worker_model
+    with slot_counter.get_lock():
+        slot = slot_counter.value
+        slot_counter.value += 1
+    if hasattr(os, 'sched_setaffinity'):
+        available = sorted(os.sched_getaffinity(0))
+        cores = available[slot * cpu_threads:(slot + 1) * cpu_threads]
+        if len(cores) == cpu_threads:
+            os.sched_setaffinity(0, cores)
+    from faster_whisper import WhisperModel
+    _worker_model = WhisperModel(model_path, device="cpu", compute_type=compute_type,
+                                 cpu_threads=cpu_threads, num_workers=1)
+
+
+def _transcribe_chunk(audio: np.ndarray, offset: float, language: Optional[str], word_timestamps: bool):
+    """在工作进程中转录一个块，返回带绝对时间的片段列表"""
+    chunk_end = offset + len(audio) / SAMPLE_RATE
+    segments, _ = _worker_model.transcribe(audio, language=language, word_timestamps=word_timestamps)
+    result = []
+    for segment in segments:
+        start = segment.start + offset
+        if start >= chunk_end:
+            break
+        words = segment.words
+        if words:
+            words = [word._replace(start=word.start + offset, end=min(word.end + offset, chunk_end))
+                     for word in words]
+        result.append(segment._replace(start=start, end=min(segment.end + offset, chunk_end), words=words))
+    return result
+
+
+def find_split_points(audio: np.ndarray, chunk_seconds: float = CHUNK_SECONDS,
+                      search_seconds: float = SEARCH_SECONDS) -> List[int]:
+    """返回切分点（采样下标），首尾分别为0和len(audio)"""
+    frame = int(ENERGY_FRAME_SECONDS * SAMPLE_RATE)
+    frames = len(audio) // frame
+    chunk_frames = int(chunk_seconds / ENERGY_FRAME_SECONDS)
+    search_frames = int(search_seconds / ENERGY_FRAME_SECONDS)
+    if frames <= chunk_frames + search_frames:
+        return [0, len(audio)]
+
+    energy = np.square(audio[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    energy = np.convolve(energy, np.ones(ENERGY_SMOOTH_FRAMES) / ENERGY_SMOOTH_FRAMES, mode='same')
+
+    points = [0]
+    # 剩余部分不足一个块加搜索范围时并入最后一块，避免产生过短的尾块
+    while points[-1] + chunk_frames + search_frames < frames:
+        center = points[-1] + chunk_frames
+        low = max(points[-1] + chunk_frames // 2, center - search_frames)
+        high = min(frames, center + search_frames)
+        points.append(low + int(np.argmin(energy[low:high])))
+    return [point * frame for point in points] + [len(audio)]
+
+
+def detect_language(model, audio: np.ndarray) -> Tuple[str, float]:
+    """用主进程模型对前30秒做语言检测"""
+    extractor = model.feature_extractor
+    features = extractor(audio[:extractor.n_samples])[:, :extractor.nb_max_frames]
+    encoder_output = model.encode(features)
+    token, probability = model.model.detect_language(encoder_output)[0][0]
+    return token[2:-2], probability
+
+
+def _normalize(text: str) -> str:
+    return _NORMALIZE_PATTERN.sub('', text).lower()
+
+
+class ParallelTranscriber:
+    """长音频并行转录进程池"""
+
+    def __init__(self, model_path: str, num_processes: int, cpu_threads: int,
+                 chunk_seconds: float = CHUNK_SECONDS, compute_type: str = "int8"):
+        self.model_path = model_path
+        self.num_processes = max(1, num_processes)
+        self.cpu_threads = max(1, cpu_threads)
+        self.chunk_seconds = chunk_seconds
+        # 使用spawn：fork会复制主进程中已初始化的模型和线程状态
+        context = multiprocessing.get_context('spawn')
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_path, self.cpu_threads, compute_type, context.Value('i', 0)),
+        )
+        logger.info(f"长音频并行转录: {self.num_processes} 个进程 x {self.cpu_threads} 线程, 块长 {chunk_seconds}s")
+
+    def transcribe(self, audio: np.ndarray, language: Optional[str] = None, word_timestamps: bool = False,
+                   language_detector=None):
+        """并行转录，返回 (按时间顺序的片段生成器, ParallelInfo)
+
+        language为None时用 language_detector(audio) 检测一次，所有块使用同一语言。
+        """
+        duration = len(audio) / SAMPLE_RATE
+        language_probability = 1.0
+        if language is None and language_detector is not None:
+            language, language_probability = language_detector(audio)
+
+        points = find_split_points(audio, self.chunk_seconds)
+        futures = [
+            self._executor.submit(_transcribe_chunk, audio[start:end], start / SAMPLE_RATE, language, word_timestamps)
+            for start, end in zip(points, points[1:])
+        ]
+        logger.info(f"音频 {duration:.1f}s 切分为 {len(futures)} 块并行转录")
+        return self._stitch(futures), ParallelInfo(language, language_probability, duration)
+
+    def _stitch(self, futures) -> Iterator:
+        last_end = 0.0
+        last_text = None
+        try:
+            for future in futures:
+                for segment in future.result():
+                    overlaps = segment.start < last_end - DEDUP_TOLERANCE_SECONDS
+                    if overlaps and (segment.end <= last_end or _normalize(segment.text) == last_text):
+                        continue
+                    last_end = max(last_end, segment.end)
+                    last_text = _normalize(segment.text)
+                    yield segment
+        finally:
+            # 调用方提前停止或出错时取消尚未开始的块
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一次解码的PCM缓冲
+上传文件只用ffmpeg解码一次，得到16kHz单声道float32采样；
+时长计算、静音切分和 model.transcribe(ndarray) 都使用同一个缓冲，不再重复解析容器和重采样。
+长音频通过内存映射文件保存，由操作系统页缓存按需换入。
+"""
+
+import logging
+import os
+import subprocess
+import tempfile
+from typing import Iterator, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# 短于该时长的音频直接读入内存，更长的使用内存映射
+MMAP_MIN_SECONDS = 120
+
+
+class DecodedAudio:
+    """解码后的音频，samples 为 float32 数组（可能是 np.memmap）"""
+
+    def __init__(self, samples: np.ndarray, pcm_path: Optional[str] = None):
+        self.samples = samples
+        self.pcm_path = pcm_path
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / SAMPLE_RATE
+
+    @property
+    def memory_mapped(self) -> bool:
+        return isinstance(self.samples, np.memmap)
+
+    def close(self):
+        """释放映射并删除仍存在的PCM文件"""
+        self.samples = np.zeros(0, dtype=np.float32)
+        if self.pcm_path and os.path.exists(self.pcm_path):
+            try:
+                os.unlink(self.pcm_path)
+            except OSError as e:
+                logger.warning(f"Failed to remove PCM file {self.pcm_path}: {e}")
+        self.pcm_path = None
+
+
+def decode_file(path: str, mmap_min_seconds: float = MMAP_MIN_SECONDS) -> DecodedAudio:
+    """用ffmpeg把任意音频文件解码为16kHz单声道float32"""
+    fd, pcm_path = tempfile.mkstemp(prefix='whisper_pcm_', suffix='.f32')
+    os.close(fd)
+    command = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', path,
+               '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), pcm_path]
+    try:
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            stderr = result.stderr.decode('utf-8', errors='replace').strip()
+            raise RuntimeError(f"ffmpeg decode failed: {stderr or result.returncode}")
+
+        num_samples = os.path.getsize(pcm_path) // 4
+        if num_samples < mmap_min_seconds * SAMPLE_RATE:
+            samples = np.fromfile(pcm_path, dtype=np.float32, count=num_samples)
+            os.unlink(pcm_path)
+            return DecodedAudio(samples)
+
+        samples = np.memmap(pcm_path, dtype=np.float32, mode='r', shape=(num_samples,))
+        try:
+            # POSIX下映射建立后即可删除文件，映射释放时空间自动回收
+            os.unlink(pcm_path)
+            pcm_path = None
+        except OSError:
+            pass  # Windows需要在close()时删除
+        return DecodedAudio(samples, pcm_path)
+    except Exception:
+        if pcm_path and os.path.exists(pcm_path):
+            os.unlink(pcm_path)
+        raise
+
+
+def iter_pcm_chunks(samples: np.ndarray, chunk_seconds: float = 1.0) -> Iterator[np.ndarray]:
+    """把已解码的采样按块产出（复制为普通数组），接口与 FfmpegPcmDecoder.iter_pcm 相同"""
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    for start in range(0, len(samples), chunk):
+        yield np.array(samples[start:start + chunk], dtype=np.float32)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转录结果缓存
+- 按内容寻址：键由音频sha256、模型、语言、词级时间戳和解码选项组成
+- 磁盘存储，每个结果一个JSON文件，超过容量上限时按最近使用时间淘汰
+- 单飞(single-flight)：相同键的任务正在进行时，后到的请求直接关联到该任务
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 解码逻辑变化导致结果不同时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+
+def cache_key(content_sha256: str, model: str, language: Optional[str], word_timestamps: bool,
+              **decode_options) -> str:
+    """计算结果缓存键"""
+    material = json.dumps({
+        "version": CACHE_VERSION,
+        "sha256": content_sha256,
+        "model": model,
+        "language": language or 'auto',
+        "word_timestamps": bool(word_timestamps),
+        "options": decode_options,
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def inflight_key(key: str, **request_options) -> str:
+    """进行中任务表的键：结果相同但调度或响应方式不同（如优先级、结果格式）的请求不共享任务"""
+    return ";".join([key, *(f"{name}={value}" for name, value in sorted(request_options.items()))])
+
+
+class ResultCache:
+    """磁盘LRU结果缓存 + 进行中任务表"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> 文件大小，按最近使用排序（最旧在前）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        # key -> task_id，相同内容的进行中任务
+        self._inflight: Dict[str, str] = {}
+        self._hits = 0
+        self._misses = 0
+        self._deduplicated = 0
+        self._evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        """启动时按文件修改时间恢复LRU顺序"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+        if entries:
+            logger.info(f"结果缓存: {len(entries)} 条, {self._total_bytes / 2**20:.1f} MB")
+        self._evict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存结果，命中时刷新使用时间"""
+        with self._lock:
+            if key not in self._entries:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(self._path(key))
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取缓存结果失败 {key[:12]}: {e}")
+            self._discard(key)
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """写入结果（先写临时文件再重命名，读取方不会看到半个文件）"""
+        payload = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        if len(payload) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"写入缓存结果失败 {key[:12]}: {e}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+        with self._lock:
+            self._total_bytes += len(payload) - self._entries.pop(key, 0)
+            self._entries[key] = len(payload)
+        self._evict()
+
+    def _discard(self, key: str):
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """超过容量上限时删除最久未使用的结果"""
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes or not self._entries:
+                    return
+                key, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                self._evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+    def claim(self, key: str, task_id: str, is_active) -> Optional[str]:
+        """登记进行中的任务；已有相同键的活动任务时返回其ID，不登记新任务
+
+        is_active(task_id) 用于判断已登记的任务是否仍在进行（可能已失败或过期）。
+        """
+        with self._lock:
+            existing = self._inflight.get(key)
+            if existing is not None and is_active(existing):
+                self._deduplicated += 1
+                return existing
+            self._inflight[key] = task_id
+            return None
+
+    def release(self, key: str, task_id: str):
+        """任务结束后移出进行中任务表"""
+        with self._lock:
+            if self._inflight.get(key) == task_id:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._total_bytes / 2**20, 2),
+                "max_size_mb": round(self.max_bytes / 2**20, 2),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "deduplicated": self._deduplicated,
+                "inflight": len(self._inflight),
+                "evictions": self._evictions,
+            }
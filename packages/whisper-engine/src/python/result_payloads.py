@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已完成任务的响应缓存
+- 已完成任务的记录不会再变化，/status 的响应体按 (task_id, 请求变体) 只序列化一次，保存为不可变字节
+- 强ETag为响应体sha256，每种内容编码(gzip/deflate)各有自己的ETag，压缩结果同样只计算一次
+- 命中时不读取任务存储、不重新序列化；超过容量上限时按最近使用时间淘汰
+- 进行中的任务按版本（状态、进度、片段数等）缓存，每个 (task_id, 变体) 只保留最新版本，版本未变的轮询不再序列化
+"""
+
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Optional, Set, Tuple
+
+# 响应体分块输出的大小
+STREAM_CHUNK_BYTES = 64 * 1024
+# 小于该大小的响应不压缩
+MIN_COMPRESS_BYTES = 1024
+CONTENT_CODINGS = ('gzip', 'deflate')
+
+
+class Payload:
+    """一份序列化后的响应体及其压缩版本"""
+
+    __slots__ = ('body', 'mimetype', 'digest', 'version', 'cached', '_encoded')
+
+    def __init__(self, body: bytes, mimetype: str):
+        self.body = body
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.version: Hashable = None  # 进行中任务的记录版本，已结束任务为None
+        self.cached = False  # 是否在 PayloadCache 中（压缩版本是否计入缓存大小）
+        self._encoded: Dict[str, bytes] = {}
+
+    def etag(self, coding: Optional[str] = None) -> str:
+        """不加引号的强ETag，不同内容编码的表示各不相同"""
+        return self.digest if coding is None else f"{self.digest}-{coding}"
+
+    def etags(self) -> Tuple[str, ...]:
+        return (self.etag(), *(self.etag(coding) for coding in CONTENT_CODINGS))
+
+    def encoded(self, coding: str) -> bytes:
+        """按内容编码压缩后的响应体，每种编码只压缩一次"""
+        data = self._encoded.get(coding)
+        if data is None:
+            data = self._encoded.setdefault(coding, compress(self.body, coding))
+        return data
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(data) for data in self._encoded.values())
+
+
+def compress(data: bytes, coding: str) -> bytes:
+    """按内容编码（gzip/deflate）压缩"""
+    if coding == 'gzip':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return zlib.compress(data, 6)
+
+
+def iter_chunks(data: bytes, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """按块输出响应体，不为每个请求复制整个响应"""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
+
+
+class PayloadCache:
+    """(task_id, 变体) -> Payload 的LRU缓存，每个键只保留一个版本"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], Payload]" = OrderedDict()
+        # task_id -> 该任务在缓存中的键，删除任务时不必扫描全部条目
+        self._task_keys: Dict[str, Set[Tuple[str, Hashable]]] = {}
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+        self._evictions = 0
+
+    def get(self, task_id: str, variant: Hashable, version: Hashable = None) -> Optional[Payload]:
+        """取指定版本的响应；version 为None时只命中已结束任务的响应
+
+        未命中不在此计数：同一请求可能先后按两种版本查找，由调用方在重新序列化时调用 record_miss。
+        """
+        with self._lock:
+            payload = self._entries.get((task_id, variant))
+            if payload is None or payload.version != version:
+                return None
+            self._entries.move_to_end((task_id, variant))
+            self._hits += 1
+            return payload
+
+    def put(self, task_id: str, variant: Hashable, payload: Payload, version: Hashable = None):
+        """保存响应，替换同一键下的旧版本"""
+        if payload.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop((task_id, variant), None)
+            if previous is not None:
+                self._remove(previous)
+            payload.version = version
+            payload.cached = True
+            self._entries[(task_id, variant)] = payload
+            self._task_keys.setdefault(task_id, set()).add((task_id, variant))
+            self._total_bytes += payload.size
+            self._evict()
+
+    def encoded(self, payload: Payload, coding: str) -> bytes:
+        """压缩后的响应体，缓存中的Payload同时计入压缩版本的大小；压缩时不持有锁"""
+        data = payload._encoded.get(coding)
+        if data is not None:
+            return data
+        data = compress(payload.body, coding)
+        with self._lock:
+            stored = payload._encoded.setdefault(coding, data)
+            if stored is data and payload.cached:
+                self._total_bytes += len(data)
+                self._evict()
+        return stored
+
+    def record_miss(self):
+        with self._lock:
+            self._misses += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self._not_modified += 1
+
+    def discard(self, task_id: str):
+        """任务被删除或清理时移除其所有变体"""
+        with self._lock:
+            for key in self._task_keys.pop(task_id, ()):
+                self._remove(self._entries.pop(key))
+
+    def _remove(self, payload: Payload):
+        payload.cached = False
+        self._total_bytes -= payload.size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, payload = self._entries.popitem(last=False)
+            keys = self._task_keys[key[0]]
+            keys.discard(key)
+            if not keys:
+                del self._task_keys[key[0]]
+            self._remove(payload)
+            self._evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._total_bytes / 2**20, 2),
+                "max_size_mb": round(self.max_bytes / 2**20, 2),
+                "hits": self._hits,
+                "misses": self._misses,
+                "not_modified": self._not_modified,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已完成任务的结果存储
+- 结果在任务结束时写入磁盘，每个任务一个 zlib 压缩的JSON文件；任务元数据仍由任务存储保存
+- 内存中只保留最近读取的少量结果（LRU热集），已完成任务数增长时进程内存不随之增长
+"""
+
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from columnar import json_default
+
+logger = logging.getLogger(__name__)
+
+# 压缩级别：转录JSON重复度高，级别6已接近最小体积
+COMPRESS_LEVEL = 6
+
+
+class ResultStore:
+    """磁盘压缩结果 + 内存LRU热集"""
+
+    def __init__(self, directory: str, hot_size: int = 8):
+        self.directory = directory
+        self.hot_size = hot_size
+        self._lock = threading.Lock()
+        self._hot: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._hits = 0
+        self._loads = 0
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, task_id: str) -> str:
+        return os.path.join(self.directory, f"{task_id}.json.z")
+
+    def put(self, task_id: str, result: Dict[str, Any]):
+        """压缩写入结果（先写临时文件再重命名），并放入热集"""
+        payload = json.dumps(result, ensure_ascii=False, default=json_default).encode('utf-8')
+        path = self._path(task_id)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(zlib.compress(payload, COMPRESS_LEVEL))
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        with self._lock:
+            self._writes += 1
+            self._remember(task_id, result)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """读取结果，不存在时返回None"""
+        with self._lock:
+            result = self._hot.get(task_id)
+            if result is not None:
+                self._hot.move_to_end(task_id)
+                self._hits += 1
+                return result
+        try:
+            with open(self._path(task_id), 'rb') as f:
+                result = json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"读取任务结果失败 {task_id}: {e}")
+            return None
+        with self._lock:
+            self._loads += 1
+            self._remember(task_id, result)
+        return result
+
+    def _remember(self, task_id: str, result: Dict[str, Any]):
+        if self.hot_size <= 0:
+            return
+        self._hot[task_id] = result
+        self._hot.move_to_end(task_id)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def delete(self, task_id: str):
+        with self._lock:
+            self._hot.pop(task_id, None)
+        try:
+            os.unlink(self._path(task_id))
+        except OSError:
+            pass
+
+    def retain(self, task_ids: Iterable[str]) -> int:
+        """删除不属于任何已知任务的结果文件（如上次运行中已清理或内存存储重启），返回删除数"""
+        keep = set(task_ids)
+        removed = 0
+        for name in os.listdir(self.directory):
+            task_id = name.split('.', 1)[0]
+            if task_id in keep and name.endswith('.json.z'):
+                continue
+            try:
+                os.unlink(os.path.join(self.directory, name))
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"清理了 {removed} 个不属于任何任务的结果文件")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hot_entries": len(self._hot),
+                "hot_size": self.hot_size,
+                "hot_hits": self._hits,
+                "disk_loads": self._loads,
+                "writes": self._writes,
+            }
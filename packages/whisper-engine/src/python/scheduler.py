@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转录任务调度器
+固定数量的推理工作线程 + 有界优先队列，避免突发上传时线程无限增长抢占CPU
+
+出队顺序：先按优先级类别（interactive 先于 batch），同类中按估算代价从小到大（短作业优先），
+并按等待时间老化：每等待1秒，排序代价减少 aging_rate，长任务和 batch 任务不会被无限推后。
+所有任务老化速度相同，两个任务的相对顺序不随时间变化，因此排序键可以在入队时一次算出：
+    类别偏移 + 代价 - aging_rate * (now - 入队时间)  的顺序等价于  类别偏移 + 代价 + aging_rate * 入队时间
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 平均值的平滑系数（指数移动平均）
+EMA_ALPHA = 0.3
+
+# 任务函数返回该值表示已移交给其他执行者（如批处理线程），工作线程立即释放且不计入耗时统计
+DEFERRED = object()
+# 任务函数返回该值表示任务已被取消，不计入耗时和实时率统计
+CANCELLED = object()
+
+# 优先级类别及其排序偏移（代价单位：按模型和选项折算后的音频秒数）
+PRIORITY_OFFSETS = {'interactive': 0.0, 'batch': 3600.0}
+DEFAULT_PRIORITY = 'interactive'
+# 每等待1秒减少的排序代价
+DEFAULT_AGING_RATE = 1.0
+# 无法估算代价（时长未知）且没有历史时使用的代价
+DEFAULT_COST = 600.0
+
+
+class QueueFullError(Exception):
+    """队列已满，应返回429"""
+
+
+class SchedulerUnavailableError(Exception):
+    """调度器不可用（已关闭或没有工作线程），应返回503"""
+
+
+class Job:
+    """队列中的一个转录任务"""
+
+    __slots__ = ('task_id', 'func', 'args', 'kwargs', 'audio_duration', 'priority', 'cost', 'enqueued_at',
+                 'started_at')
+
+    def __init__(self, task_id: str, func: Callable, args: tuple, kwargs: dict, audio_duration: Optional[float],
+                 priority: str = DEFAULT_PRIORITY, cost: float = DEFAULT_COST):
+        self.task_id = task_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.audio_duration = audio_duration
+        self.priority = priority
+        self.cost = cost
+        self.enqueued_at = time.time()
+        self.started_at: Optional[float] = None
+
+
+class JobScheduler:
+    """有界优先队列 + 固定工作线程池"""
+
+    def __init__(self, num_workers: int, max_queue_size: int, name: str = 'whisper-worker',
+                 aging_rate: float = DEFAULT_AGING_RATE):
+        self.num_workers = max(1, num_workers)
+        self.max_queue_size = max(0, max_queue_size)
+        self.name = name
+        self.aging_rate = max(0.0, aging_rate)
+        # (排序键, 序号, Job) 最小堆，序号保证同键时先入先出
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._avg_cost: Optional[float] = None
+        self._running: Dict[str, Job] = {}
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._accepting = False
+        # 运行统计，用于估算排队等待时间
+        self._avg_job_seconds: Optional[float] = None
+        self._avg_realtime_factor: Optional[float] = None
+        self._completed_jobs = 0
+        self._failed_jobs = 0
+        self._deferred_jobs = 0
+        self._cancelled_jobs = 0
+
+    def start(self):
+        """启动工作线程"""
+        with self._cond:
+            if self._threads:
+                return
+            self._accepting = True
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"{self.name}-{i}")
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"调度器已启动: {self.num_workers} 个推理线程, 队列上限 {self.max_queue_size}")
+
+    def shutdown(self):
+        """停止接收新任务，已排队的任务仍会被执行"""
+        with self._cond:
+            self._accepting = False
+            self._cond.notify_all()
+
+    def submit(self, task_id: str, func: Callable, *args, audio_duration: Optional[float] = None,
+               priority: str = DEFAULT_PRIORITY, cost: Optional[float] = None, **kwargs) -> int:
+        """提交任务，返回排队位置（从1开始）
+
+        priority 为 PRIORITY_OFFSETS 中的类别；cost 为估算代价，未知时使用已提交任务的平均代价。
+        """
+        if priority not in PRIORITY_OFFSETS:
+            raise ValueError(f"Unknown priority: {priority}")
+        with self._cond:
+            if not self._accepting or not any(t.is_alive() for t in self._threads):
+                raise SchedulerUnavailableError("Transcription scheduler is not accepting jobs")
+            if len(self._queue) >= self.max_queue_size:
+                raise QueueFullError(f"Transcription queue is full ({self.max_queue_size} jobs waiting)")
+            if cost is None:
+                cost = self._avg_cost if self._avg_cost is not None else DEFAULT_COST
+            else:
+                self._avg_cost = cost if self._avg_cost is None else self._avg_cost + EMA_ALPHA * (cost - self._avg_cost)
+            job = Job(task_id, func, args, kwargs, audio_duration, priority, cost)
+            key = PRIORITY_OFFSETS[priority] + cost + self.aging_rate * job.enqueued_at
+            entry = (key, next(self._sequence), job)
+            heapq.heappush(self._queue, entry)
+            self._cond.notify()
+            return sorted(self._queue).index(entry) + 1
+
+    def _ordered_jobs(self) -> List[Job]:
+        """按出队顺序排列的排队任务（调用方持有锁）"""
+        return [job for _, _, job in sorted(self._queue)]
+
+    def cancel(self, task_id: str) -> Optional[Job]:
+        """从队列中移除尚未开始的任务并返回它；任务已开始或不在队列中时返回None"""
+        with self._cond:
+            for index, (_, _, job) in enumerate(self._queue):
+                if job.task_id == task_id:
+                    self._queue[index] = self._queue[-1]
+                    self._queue.pop()
+                    heapq.heapify(self._queue)
+                    self._cancelled_jobs += 1
+                    return job
+        return None
+
+    def report_audio_duration(self, task_id: str, audio_duration: Optional[float]):
+        """任务开始解码后上报实际音频时长，用于实时率统计"""
+        if not audio_duration:
+            return
+        with self._cond:
+            job = self._running.get(task_id)
+            if job is not None:
+                job.audio_duration = audio_duration
+
+    def position(self, task_id: str) -> Optional[int]:
+        """任务在队列中的位置（从1开始），不在队列中返回None"""
+        with self._cond:
+            for index, job in enumerate(self._ordered_jobs()):
+                if job.task_id == task_id:
+                    return index + 1
+        return None
+
+    def estimated_wait(self, task_id: str) -> Optional[float]:
+        """估算任务开始执行前还需等待的秒数，无法估算时返回None"""
+        with self._cond:
+            now = time.time()
+            # 每个工作线程何时空闲（相对现在的秒数）
+            available = []
+            for job in self._running.values():
+                expected = self._expected_seconds(job)
+                if expected is None:
+                    return None
+                available.append(max(0.0, expected - (now - job.started_at)))
+            available.extend([0.0] * (self.num_workers - len(available)))
+            heapq.heapify(available)
+
+            for job in self._ordered_jobs():
+                start = heapq.heappop(available)
+                if job.task_id == task_id:
+                    return start
+                expected = self._expected_seconds(job)
+                if expected is None:
+                    return None
+                heapq.heappush(available, start + expected)
+        return None
+
+    def retry_after(self) -> int:
+        """队列满时建议客户端的重试间隔（秒）"""
+        with self._cond:
+            if self._avg_job_seconds is None:
+                return 30
+            return max(1, int(self._avg_job_seconds / self.num_workers))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.num_workers,
+                "busy_workers": len(self._running),
+                "queued": len(self._queue),
+                "queued_by_priority": {
+                    priority: sum(1 for _, _, job in self._queue if job.priority == priority)
+                    for priority in PRIORITY_OFFSETS
+                },
+                "aging_rate": self.aging_rate,
+                "max_queue_size": self.max_queue_size,
+                "completed_jobs": self._completed_jobs,
+                "failed_jobs": self._failed_jobs,
+                "deferred_jobs": self._deferred_jobs,
+                "cancelled_jobs": self._cancelled_jobs,
+                "avg_job_seconds": self._avg_job_seconds,
+                "avg_realtime_factor": self._avg_realtime_factor,
+            }
+
+    def _expected_seconds(self, job: Job) -> Optional[float]:
+        """按历史实时率或平均耗时估算任务执行时间"""
+        if job.audio_duration and self._avg_realtime_factor is not None:
+            return job.audio_duration * self._avg_realtime_factor
+        return self._avg_job_seconds
+
+    def _record_finished(self, job: Job, elapsed: float, failed: bool, deferred: bool = False,
+                         cancelled: bool = False):
+        with self._cond:
+            self._running.pop(job.task_id, None)
+            if failed:
+                self._failed_jobs += 1
+                return
+            if deferred:
+                self._deferred_jobs += 1
+                return
+            if cancelled:
+                self._cancelled_jobs += 1
+                return
+            self._completed_jobs += 1
+            if self._avg_job_seconds is None:
+                self._avg_job_seconds = elapsed
+            else:
+                self._avg_job_seconds += EMA_ALPHA * (elapsed - self._avg_job_seconds)
+            if job.audio_duration:
+                rtf = elapsed / job.audio_duration
+                if self._avg_realtime_factor is None:
+                    self._avg_realtime_factor = rtf
+                else:
+                    self._avg_realtime_factor += EMA_ALPHA * (rtf - self._avg_realtime_factor)
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._queue)
+                job.started_at = time.time()
+                self._running[job.task_id] = job
+
+            failed = False
+            outcome = None
+            try:
+                outcome = job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                failed = True
+                logger.error(f"任务 {job.task_id} 执行异常: {e}", exc_info=True)
+            finally:
+                self._record_finished(job, time.time() - job.started_at, failed,
+                                      deferred=outcome is DEFERRED, cancelled=outcome is CANCELLED)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式转录
+- FfmpegPcmDecoder: 把边上传边到达的音频字节（或本地文件）通过ffmpeg管道解码为16kHz单声道PCM
+- transcribe_pcm_windows: 按固定窗口对PCM流解码，窗口末尾未完成的片段留到下一窗口重新识别
+
+两者组合时内存占用只与窗口长度有关，与录音总时长无关。
+"""
+
+import itertools
+import logging
+import re
+import subprocess
+import threading
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+# 作为下一窗口提示词的已提交文本长度
+PROMPT_CHARS = 200
+READ_CHUNK_BYTES = 64 * 1024
+# 保留的ffmpeg错误输出行数
+STDERR_TAIL_LINES = 20
+
+_DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+class FfmpegPcmDecoder:
+    """ffmpeg管道解码器：写入任意容器格式的字节（或指定本地文件），读出float32 PCM"""
+
+    def __init__(self, input_args: Optional[list] = None, source: Optional[str] = None):
+        # info级别才会输出容器头中的时长；-nostats 关闭进度行
+        command = ['ffmpeg', '-nostdin', '-hide_banner', '-nostats', '-loglevel', 'info', *(input_args or []),
+                   '-i', source or 'pipe:0', '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1']
+        self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL if source else subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.bytes_received = 0
+        self.samples_decoded = 0
+        self._feeder: Optional[threading.Thread] = None
+        self._feed_error: Optional[Exception] = None
+        self._duration: Optional[float] = None
+        self._header_parsed = threading.Event()
+        self._stderr_tail: List[str] = []
+        # 持续读取stderr，避免管道写满阻塞ffmpeg
+        self._stderr_reader = threading.Thread(target=self._read_stderr, name='ffmpeg-stderr')
+        self._stderr_reader.daemon = True
+        self._stderr_reader.start()
+
+    def _read_stderr(self):
+        for raw in self.process.stderr:
+            line = raw.decode('utf-8', errors='replace').rstrip()
+            match = _DURATION_PATTERN.search(line)
+            if match and self._duration is None:
+                hours, minutes, seconds = match.groups()
+                self._duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            if line.startswith(('Output #0', 'Stream mapping')):
+                self._header_parsed.set()
+            self._stderr_tail = (self._stderr_tail + [line])[-STDERR_TAIL_LINES:]
+        self._header_parsed.set()
+
+    def duration(self, timeout: float = 10.0) -> Optional[float]:
+        """容器头中的音频时长（秒），管道输入或格式不含时长时为None"""
+        self._header_parsed.wait(timeout)
+        return self._duration
+
+    def feed_from(self, stream: BinaryIO, chunk_size: int = READ_CHUNK_BYTES):
+        """在后台线程中把输入流复制到ffmpeg，读到流末尾后关闭stdin"""
+        def copy():
+            try:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    self.bytes_received += len(chunk)
+                    self.process.stdin.write(chunk)
+            except (BrokenPipeError, ValueError):
+                pass  # ffmpeg已退出，错误信息在stderr中
+            except Exception as e:
+                self._feed_error = e
+            finally:
+                try:
+                    self.process.stdin.close()
+                except OSError:
+                    pass
+
+        self._feeder = threading.Thread(target=copy, name='ffmpeg-feeder')
+        self._feeder.daemon = True
+        self._feeder.start()
+
+    def iter_pcm(self, chunk_seconds: float = 1.0) -> Iterator[np.ndarray]:
+        """按块读取解码后的PCM，直到ffmpeg输出结束"""
+        chunk_bytes = int(chunk_seconds * SAMPLE_RATE) * 4
+        pending = b''
+        while True:
+            data = self.process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % 4
+            pending = data[usable:]
+            if usable:
+                self.samples_decoded += usable // 4
+                yield np.frombuffer(data[:usable], dtype=np.float32)
+        self.process.wait()
+        if self._feeder is not None:
+            self._feeder.join()
+        if self._feed_error is not None:
+            raise self._feed_error
+        if self.process.returncode != 0:
+            self._stderr_reader.join(timeout=1)
+            stderr = '\n'.join(line for line in self._stderr_tail if line.strip()).strip()
+            raise RuntimeError(f"ffmpeg decode failed: {stderr or self.process.returncode}")
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+def probe_duration(path: str, timeout: float = 10.0) -> Optional[float]:
+    """读取文件容器头中的时长（秒），只解析头部不解码音频；无法得到时长时返回None"""
+    command = ['ffmpeg', '-nostdin', '-hide_banner', '-i', path]
+    try:
+        # 没有指定输出时ffmpeg以非0状态退出，头信息仍在stderr中
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Could not probe duration of {path}: {e}")
+        return None
+    match = _DURATION_PATTERN.search(result.stderr.decode('utf-8', errors='replace'))
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def peek_pcm(pcm_chunks: Iterable[np.ndarray], max_samples: int):
+    """预读不超过 max_samples 的音频
+
+    流在此之前结束时返回 (完整音频, None)，否则返回 (None, 包含已预读部分的迭代器)。
+    """
+    chunks = iter(pcm_chunks)
+    head = []
+    size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size > max_samples:
+            return None, itertools.chain(head, chunks)
+    return (np.concatenate(head) if head else np.zeros(0, dtype=np.float32)), None
+
+
+def segment_to_dict(segment, offset: float, word_timestamps: bool) -> Dict[str, Any]:
+    """faster-whisper片段转为带绝对时间戳的字典"""
+    data = {
+        "start": round(segment.start + offset, 3),
+        "end": round(segment.end + offset, 3),
+        "text": segment.text
+    }
+    if word_timestamps and getattr(segment, 'words', None):
+        data["words"] = [{
+            "word": word.word,
+            "start": round(word.start + offset, 3),
+            "end": round(word.end + offset, 3),
+            "probability": word.probability
+        } for word in segment.words]
+    return data
+
+
+def transcribe_pcm_windows(model, pcm_chunks: Iterable[np.ndarray], language: Optional[str] = None,
+                           word_timestamps: bool = False, window_seconds: float = WINDOW_SECONDS,
+                           info_callback=None, start_offset: float = 0.0,
+                           **transcribe_options) -> Iterator[Dict[str, Any]]:
+    """对PCM流按窗口转录，逐个产出带绝对时间戳的片段
+
+    每个窗口中最后一个片段可能被截断，除非流已结束，否则丢弃它，
+    从最后一个已提交片段的结束位置开始保留音频进入下一窗口，不会重复输出。
+    start_offset 为PCM流第一个采样在整个录音中的时间（秒），用于只转录部分范围的情况。
+    """
+    window_samples = int(window_seconds * SAMPLE_RATE)
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = start_offset  # buffer[0] 对应的绝对时间（秒）
+    committed_text = ''
+    detected_language = language
+    first_window = True
+
+    def decode(audio: np.ndarray) -> Iterator:
+        nonlocal detected_language, first_window
+        options = dict(transcribe_options)
+        if committed_text:
+            options['initial_prompt'] = committed_text[-PROMPT_CHARS:]
+        segments, info = model.transcribe(audio, language=detected_language,
+                                          word_timestamps=word_timestamps, **options)
+        if first_window:
+            # 第一个窗口检测到的语言固定用于后续窗口
+            first_window = False
+            detected_language = detected_language or info.language
+            if info_callback is not None:
+                info_callback(info)
+        return segments
+
+    chunks = iter(pcm_chunks)
+    finished = False
+    while not finished:
+        # 凑满一个窗口或读到流末尾
+        parts = [buffer]
+        size = len(buffer)
+        while size < window_samples:
+            chunk = next(chunks, None)
+            if chunk is None:
+                finished = True
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        buffer = np.concatenate(parts) if len(parts) > 1 else buffer
+        if not len(buffer):
+            break
+
+        window = buffer[:window_samples]
+        final = finished and len(buffer) <= window_samples
+        # 片段生成器不整体展开：向前看一个片段，确认它不是窗口中最后一个后立即产出，
+        # 调用方在每个片段之间都能停止（如任务取消），不必等整个窗口解码完
+        consumed = len(window)
+        pending = None
+        kept = 0
+        for segment in decode(window):
+            if pending is not None:
+                data = segment_to_dict(pending, offset, word_timestamps)
+                committed_text += data["text"]
+                kept += 1
+                consumed = min(len(window), int(pending.end * SAMPLE_RATE))
+                yield data
+            pending = segment
+        if pending is not None and (final or not kept):
+            data = segment_to_dict(pending, offset, word_timestamps)
+            committed_text += data["text"]
+            consumed = len(window)
+            yield data
+        if consumed <= 0:
+            consumed = len(window)
+        buffer = buffer[consumed:]
+        offset += consumed / SAMPLE_RATE
+        if finished and not final:
+            finished = False
+            chunks = iter(())  # 输入已结束，继续处理剩余的缓冲音频
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务事件日志
+为 /events/<task_id> SSE 推送保存每个任务的事件序列，支持按事件ID断点续传
+"""
+
+import collections
+import json
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from columnar import json_default
+
+# 终止事件：发布后该任务的事件流结束
+TERMINAL_EVENTS = ('completed', 'error', 'cancelled')
+
+# 已结束任务的事件日志保留时间（秒）
+CLOSED_LOG_TTL = 600
+
+
+class TaskEvents:
+    """按任务保存事件，订阅者通过 wait() 阻塞等待新事件"""
+
+    def __init__(self, closed_log_ttl: float = CLOSED_LOG_TTL):
+        self.closed_log_ttl = closed_log_ttl
+        self._cond = threading.Condition()
+        # task_id -> [(event_id, event, data_json)]
+        self._logs: Dict[str, List[Tuple[int, str, str]]] = {}
+        self._next_id: Dict[str, int] = {}
+        self._closed: Dict[str, float] = {}
+        self._closed_order: collections.deque = collections.deque()
+
+    def publish(self, task_id: str, event: str, data: Dict[str, Any]) -> int:
+        """发布事件，返回事件ID"""
+        payload = json.dumps(data, ensure_ascii=False, default=json_default)
+        with self._cond:
+            if task_id in self._closed:
+                return self._next_id.get(task_id, 1) - 1
+            log = self._logs.setdefault(task_id, [])
+            event_id = self._next_id.get(task_id, 1)
+            self._next_id[task_id] = event_id + 1
+            # 连续的进度事件只保留最新一条，日志长度只随片段数增长
+            if event == 'progress' and log and log[-1][1] == 'progress':
+                log[-1] = (event_id, event, payload)
+            else:
+                log.append((event_id, event, payload))
+            if event in TERMINAL_EVENTS:
+                # 最终结果已包含全部片段，只保留终止事件
+                self._logs[task_id] = [(event_id, event, payload)]
+                self._closed[task_id] = time.time()
+                self._closed_order.append(task_id)
+            self._purge_closed()
+            self._cond.notify_all()
+            return event_id
+
+    def has_log(self, task_id: str) -> bool:
+        with self._cond:
+            return task_id in self._logs
+
+    def wait(self, task_id: str, after_id: int, timeout: float) -> Tuple[List[Tuple[int, str, str]], bool]:
+        """返回 after_id 之后的事件和任务是否已结束，没有新事件时最多等待 timeout 秒"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                log = self._logs.get(task_id, [])
+                events = [entry for entry in log if entry[0] > after_id]
+                closed = task_id in self._closed
+                remaining = deadline - time.time()
+                if events or closed or remaining <= 0:
+                    return events, closed
+                self._cond.wait(remaining)
+
+    def discard(self, task_id: str):
+        with self._cond:
+            self._logs.pop(task_id, None)
+            self._next_id.pop(task_id, None)
+            self._closed.pop(task_id, None)
+            self._cond.notify_all()
+
+    def _purge_closed(self):
+        """清理过期的已结束日志（调用方持有锁）"""
+        now = time.time()
+        while self._closed_order:
+            task_id = self._closed_order[0]
+            closed_at = self._closed.get(task_id)
+            if closed_at is not None and now - closed_at < self.closed_log_ttl:
+                break
+            self._closed_order.popleft()
+            if closed_at is not None:
+                self._logs.pop(task_id, None)
+                self._next_id.pop(task_id, None)
+                self._closed.pop(task_id, None)
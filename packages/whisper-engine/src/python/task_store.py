@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务状态存储
+- MemoryTaskStore: 进程内字典，开发环境使用，重启后丢失
+- SQLiteTaskStore: SQLite(WAL)持久化，按任务逐行upsert，启动时不再加载全部历史
+指定 ResultStore 时，终态任务的结果写入其中的压缩文件，任务存储只保留元数据，读取时按需附加结果。
+"""
+
+import heapq
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from columnar import json_default
+from result_store import ResultStore
+
+logger = logging.getLogger(__name__)
+
+# 终态任务：不会再被工作线程修改
+TERMINAL_STATUSES = ('completed', 'error', 'cancelled')
+
+
+def _created_timestamp(record: Dict[str, Any]) -> float:
+    """取任务创建时间戳，缺失时视为当前时间"""
+    created_at = record.get('created_at')
+    if created_at:
+        try:
+            return datetime.fromisoformat(created_at).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class TaskStore(ABC):
+    """任务存储接口
+
+    用法与字典一致：store[task_id] = record 会立即持久化该任务；
+    工作线程就地修改记录（进度、部分片段）只在内存中生效，进程重启时未结束的任务标记为失败，
+    终态记录通过 store[task_id] = record 写入。多字段的复合修改应持有 store.lock。
+    """
+
+    def __init__(self, results: Optional[ResultStore] = None):
+        self.lock = threading.RLock()
+        self.results = results
+
+    def _spill(self, task_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """终态任务的结果移入结果存储，返回不含结果的记录副本；写入失败时保留在记录中"""
+        if self.results is None or record.get('status') not in TERMINAL_STATUSES or not isinstance(record.get('result'), dict):
+            return record
+        try:
+            self.results.put(task_id, record['result'])
+        except OSError as e:
+            logger.warning(f"Failed to spill result of task {task_id}: {e}")
+            return record
+        record = dict(record)
+        del record['result']
+        record['result_spilled'] = True
+        return record
+
+    def _attach(self, task_id: str, record: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """返回附加了结果的记录副本（结果不在结果存储中时原样返回）"""
+        if record is None or not record.get('result_spilled') or self.results is None:
+            return record
+        record = dict(record)
+        del record['result_spilled']
+        result = self.results.get(task_id)
+        if result is not None:
+            record['result'] = result
+        return record
+
+    def _discard_results(self, task_ids: List[str]):
+        if self.results is not None:
+            for task_id in task_ids:
+                self.results.delete(task_id)
+
+    @abstractmethod
+    def get(self, task_id: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """取任务记录（附加结果），不存在时返回 default"""
+
+    @abstractmethod
+    def exists(self, task_id: str) -> bool:
+        """任务是否存在：只查元数据，不读取结果存储"""
+
+    @abstractmethod
+    def __setitem__(self, task_id: str, record: Dict[str, Any]):
+        """写入并持久化任务记录，终态任务的结果移入结果存储"""
+
+    @abstractmethod
+    def pop(self, task_id: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """删除任务及其结果，返回删除前的记录"""
+
+    @abstractmethod
+    def statuses(self) -> Dict[str, str]:
+        """所有任务的 task_id -> status"""
+
+    @abstractmethod
+    def purge_expired(self, max_age_seconds: float) -> List[str]:
+        """删除创建时间早于 max_age_seconds 的任务，返回被删除的任务ID
+
+        按创建时间有序的索引淘汰，代价为 O(k log n)，k 为过期任务数
+        """
+
+    @abstractmethod
+    def purge(self, older_than_seconds: float = 0, statuses: tuple = TERMINAL_STATUSES) -> List[str]:
+        """批量删除指定状态、创建时间早于 older_than_seconds 的任务（管理接口使用）"""
+
+    def close(self):
+        pass
+
+    def __getitem__(self, task_id: str) -> Dict[str, Any]:
+        record = self.get(task_id)
+        if record is None:
+            raise KeyError(task_id)
+        return record
+
+    def __contains__(self, task_id: object) -> bool:
+        return isinstance(task_id, str) and self.exists(task_id)
+
+    def __len__(self) -> int:
+        return len(self.statuses())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.statuses()))
+
+    def keys(self) -> List[str]:
+        return list(self.statuses())
+
+
+class MemoryTaskStore(TaskStore):
+    """进程内字典存储"""
+
+    def __init__(self, results: Optional[ResultStore] = None):
+        super().__init__(results)
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        # 过期索引：(创建时间戳, task_id) 最小堆，任务删除后的旧条目在出堆时跳过
+        self._created: Dict[str, float] = {}
+        self._expiry_heap: List[tuple] = []
+
+    def get(self, task_id, default=None):
+        record = self._tasks.get(task_id)
+        return default if record is None else self._attach(task_id, record)
+
+    def exists(self, task_id):
+        return task_id in self._tasks
+
+    def __setitem__(self, task_id, record):
+        record = self._spill(task_id, record)
+        with self.lock:
+            if task_id not in self._created:
+                created_at = _created_timestamp(record)
+                self._created[task_id] = created_at
+                heapq.heappush(self._expiry_heap, (created_at, task_id))
+            self._tasks[task_id] = record
+
+    def pop(self, task_id, default=None):
+        with self.lock:
+            self._created.pop(task_id, None)
+            record = self._tasks.pop(task_id, None)
+        if record is None:
+            return default
+        record = self._attach(task_id, record)
+        self._discard_results([task_id])
+        return record
+
+    def statuses(self):
+        with self.lock:
+            return {task_id: record.get('status', 'unknown') for task_id, record in self._tasks.items()}
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def purge_expired(self, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        expired = []
+        with self.lock:
+            while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+                created_at, task_id = heapq.heappop(self._expiry_heap)
+                if self._created.get(task_id) != created_at:
+                    continue  # 任务已被删除或重新创建
+                del self._created[task_id]
+                self._tasks.pop(task_id, None)
+                expired.append(task_id)
+        self._discard_results(expired)
+        return expired
+
+    def purge(self, older_than_seconds=0, statuses=TERMINAL_STATUSES):
+        cutoff = time.time() - older_than_seconds
+        with self.lock:
+            purged = [
+                task_id for task_id, record in self._tasks.items()
+                if record.get('status') in statuses and self._created.get(task_id, 0) <= cutoff
+            ]
+            for task_id in purged:
+                self._tasks.pop(task_id, None)
+                self._created.pop(task_id, None)
+        self._discard_results(purged)
+        return purged
+
+
+class SQLiteTaskStore(TaskStore):
+    """SQLite(WAL)存储
+
+    进行中的任务保存在内存中供工作线程就地更新，终态任务只在数据库中，按需读取。
+    """
+
+    def __init__(self, db_path: str, results: Optional[ResultStore] = None):
+        super().__init__(results)
+        self.db_path = db_path
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " task_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " record TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)")
+        self._fail_interrupted_tasks()
+
+    def _fail_interrupted_tasks(self):
+        """上次进程退出时未完成的任务无法继续，标记为错误"""
+        placeholders = ','.join('?' * len(TERMINAL_STATUSES))
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT task_id, record FROM tasks WHERE status NOT IN ({placeholders})", TERMINAL_STATUSES
+            ).fetchall()
+        for task_id, payload in rows:
+            record = json.loads(payload)
+            record.update({
+                "status": "error",
+                "error": "Task interrupted by service restart",
+                "progress": 0,
+                "completed_at": datetime.now().isoformat()
+            })
+            record.pop('segments', None)
+            self._upsert(task_id, record)
+        if rows:
+            logger.info(f"Marked {len(rows)} interrupted tasks as failed")
+
+    def _upsert(self, task_id: str, record: Dict[str, Any]):
+        with self.lock:
+            payload = json.dumps(record, ensure_ascii=False, default=json_default)
+            status = record.get('status', 'unknown')
+        created_at = _created_timestamp(record)
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT INTO tasks (task_id, status, created_at, updated_at, record) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(task_id) DO UPDATE SET status=excluded.status, updated_at=excluded.updated_at, "
+                "record=excluded.record",
+                (task_id, status, created_at, time.time(), payload)
+            )
+
+    def get(self, task_id, default=None):
+        record = self._active.get(task_id)
+        if record is not None:
+            return record
+        with self._db_lock:
+            row = self._conn.execute("SELECT record FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return self._attach(task_id, json.loads(row[0])) if row else default
+
+    def exists(self, task_id):
+        if task_id in self._active:
+            return True
+        with self._db_lock:
+            return self._conn.execute("SELECT 1 FROM tasks WHERE task_id = ?", (task_id,)).fetchone() is not None
+
+    def __setitem__(self, task_id, record):
+        record = self._spill(task_id, record)
+        with self.lock:
+            if record.get('status') in TERMINAL_STATUSES:
+                self._active.pop(task_id, None)
+            else:
+                self._active[task_id] = record
+        self._upsert(task_id, record)
+
+    def pop(self, task_id, default=None):
+        with self.lock:
+            record = self._active.pop(task_id, None)
+        if record is None:
+            record = self.get(task_id, default)
+        with self._db_lock:
+            self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        self._discard_results([task_id])
+        return record
+
+    def statuses(self):
+        with self._db_lock:
+            rows = self._conn.execute("SELECT task_id, status FROM tasks ORDER BY created_at").fetchall()
+        result = dict(rows)
+        with self.lock:
+            result.update({task_id: record.get('status', 'unknown') for task_id, record in self._active.items()})
+        return result
+
+    def __len__(self):
+        with self._db_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def purge_expired(self, max_age_seconds):
+        # created_at 上有索引，范围删除只访问过期的行
+        cutoff = time.time() - max_age_seconds
+        with self._db_lock:
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT task_id FROM tasks WHERE created_at < ?", (cutoff,)
+            )]
+            if expired:
+                self._conn.execute("DELETE FROM tasks WHERE created_at < ?", (cutoff,))
+        with self.lock:
+            for task_id in expired:
+                self._active.pop(task_id, None)
+        self._discard_results(expired)
+        return expired
+
+    def purge(self, older_than_seconds=0, statuses=TERMINAL_STATUSES):
+        cutoff = time.time() - older_than_seconds
+        placeholders = ','.join('?' * len(statuses))
+        with self._db_lock:
+            condition = f"created_at <= ? AND status IN ({placeholders})"
+            purged = [row[0] for row in self._conn.execute(
+                f"SELECT task_id FROM tasks WHERE {condition}", (cutoff, *statuses)
+            )]
+            if purged:
+                self._conn.execute(f"DELETE FROM tasks WHERE {condition}", (cutoff, *statuses))
+        with self.lock:
+            for task_id in purged:
+                self._active.pop(task_id, None)
+        self._discard_results(purged)
+        return purged
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
+
+
+def create_task_store(backend: str, db_path: str, results: Optional[ResultStore] = None) -> TaskStore:
+    """按名称创建任务存储，并清理不属于其中任何任务的结果文件"""
+    if backend == 'memory':
+        store = MemoryTaskStore(results)
+    elif backend == 'sqlite':
+        store = SQLiteTaskStore(db_path, results)
+    else:
+        raise ValueError(f"Unknown task store backend: {backend}")
+    if results is not None:
+        results.retain(store.keys())
+    return store
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传文件落盘
+multipart解析时把文件分块直接写入临时文件，同时累计大小和sha256，
+每个上传占用的内存与文件大小无关；处理时直接移交该文件，不再 file.read() 或 file.save() 复制。
+与调用方共享文件系统时，也可以直接读取允许目录中的文件，完全不经过HTTP传输。
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Optional
+
+from flask import Request
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+class InputPathError(ValueError):
+    """服务端路径输入未启用或路径不在允许的目录中，应返回403"""
+
+
+class HashingSpoolFile:
+    """边写入边计算大小和sha256的临时文件"""
+
+    def __init__(self, suffix: str = '', directory: Optional[str] = None):
+        fd, self.name = tempfile.mkstemp(prefix='whisper_upload_', suffix=suffix, dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self._persisted = False
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def persist(self) -> str:
+        """关闭文件并把所有权交给调用方（由调用方负责删除），返回路径"""
+        self._file.close()
+        self._persisted = True
+        return self.name
+
+    def close(self):
+        """请求结束时调用；未被移交的文件直接删除"""
+        self._file.close()
+        if not self._persisted and os.path.exists(self.name):
+            os.unlink(self.name)
+
+    def __getattr__(self, name):
+        # read/seek/tell/readline 等委托给底层文件
+        if name == '_file':
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+
+class SpoolingRequest(Request):
+    """上传文件使用 HashingSpoolFile，而不是默认的内存/临时文件容器"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpoolFile(suffix=os.path.splitext(filename or '')[1])
+
+
+def resolve_input_path(path: str, allowed_dirs: Iterable[str]) -> str:
+    """校验服务端文件路径，返回解析符号链接后的真实路径
+
+    只接受绝对路径，且解析后必须位于 allowed_dirs（已是真实路径）之一中；文件不存在时抛出 FileNotFoundError。
+    """
+    allowed_dirs = list(allowed_dirs)
+    if not allowed_dirs:
+        raise InputPathError("Server-side path input is disabled (start the engine with --input-dirs)")
+    if not os.path.isabs(path):
+        raise InputPathError(f"Path must be absolute: {path}")
+    real_path = os.path.realpath(path)
+    if not any(os.path.commonpath([real_path, directory]) == directory for directory in allowed_dirs):
+        raise InputPathError(f"Path is outside the allowed input directories: {path}")
+    if not os.path.isfile(real_path):
+        raise FileNotFoundError(f"File not found: {path}")
+    return real_path
+
+
+def file_sha256(path: str) -> str:
+    """分块计算文件sha256，内存占用与文件大小无关"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+繁体转简体转换
+- 使用 opencc-python-reimplemented 自带的 t2s 词典（TSPhrases + TSCharacters）构建前缀树，正向最大匹配
+- 按标点和空白把文本切成短句，每个短句的转换结果缓存，转录中反复出现的短句只转换一次
+- 不含任何繁体字符的文本直接原样返回，不进入匹配
+"""
+
+import functools
+import logging
+import os
+import re
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 短句缓存条目数
+CACHE_SIZE = 65536
+# 前缀树节点中存放转换结果的键（文本中的字符不会是空串）
+_END = ''
+# 词典条目不会跨越这些分隔符，按它们切分短句
+_SEPARATORS = re.compile(r'([\s,.?!:;，。、；：？！…“”‘’「」『』（）《》〈〉【】—－～]+)')
+
+
+class ChineseConverter:
+    """基于词典前缀树的繁简转换器"""
+
+    def __init__(self, phrases: Dict[str, str], characters: Dict[str, str], cache_size: int = CACHE_SIZE):
+        self._trie: Dict[str, Any] = {}
+        # 词组优先于单字
+        for table in (characters, phrases):
+            for key, value in table.items():
+                node = self._trie
+                for char in key:
+                    node = node.setdefault(char, {})
+                node[_END] = value
+
+        # 快速检查用字符集：文本与它不相交时不可能命中任何会改变文本的条目
+        convertible = {key for key, value in characters.items() if len(key) == 1 and key != value}
+        for key, value in phrases.items():
+            if key != value and convertible.isdisjoint(key):
+                convertible.update(key)
+        self._convertible = frozenset(convertible)
+        self._convert_run = functools.lru_cache(maxsize=cache_size)(self._convert_uncached)
+
+    @classmethod
+    def from_opencc_package(cls, cache_size: int = CACHE_SIZE) -> Optional['ChineseConverter']:
+        """读取已安装的 opencc 包中的 t2s 词典，找不到词典文件时返回None"""
+        try:
+            import opencc
+        except ImportError:
+            return None
+        dictionary_dir = os.path.join(os.path.dirname(opencc.__file__), 'dictionary')
+        tables = []
+        for name in ('TSPhrases.txt', 'TSCharacters.txt'):
+            path = os.path.join(dictionary_dir, name)
+            if not os.path.isfile(path):
+                return None
+            tables.append(_read_table(path))
+        return cls(*tables, cache_size=cache_size)
+
+    def convert(self, text: str) -> str:
+        if not text or self._convertible.isdisjoint(text):
+            return text
+        parts = _SEPARATORS.split(text)
+        # 奇数下标是分隔符，原样保留
+        for i in range(0, len(parts), 2):
+            if parts[i]:
+                parts[i] = self._convert_run(parts[i])
+        return ''.join(parts)
+
+    def _convert_uncached(self, text: str) -> str:
+        if self._convertible.isdisjoint(text):
+            return text
+        trie = self._trie
+        result = []
+        i = 0
+        length = len(text)
+        while i < length:
+            node = trie
+            match_end = i
+            match_value = None
+            j = i
+            while j < length:
+                node = node.get(text[j])
+                if node is None:
+                    break
+                j += 1
+                value = node.get(_END)
+                if value is not None:
+                    match_end, match_value = j, value
+            if match_value is None:
+                result.append(text[i])
+                i += 1
+            else:
+                result.append(match_value)
+                i = match_end
+        return ''.join(result)
+
+    def cache_info(self) -> Dict[str, int]:
+        info = self._convert_run.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+
+def _read_table(path: str) -> Dict[str, str]:
+    """读取 OpenCC 文本词典（键\t值，多个候选值以空格分隔时取第一个）"""
+    table = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            key, _, values = line.rstrip('\n').partition('\t')
+            if key and values:
+                table[key] = values.split(' ')[0]
+    return table
+
@@ -1,9 +1,10 @@
 import argparse
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, Response
 from flask_cors import CORS
 from faster_whisper import WhisperModel
 import tempfile
+import hashlib
 import os
 import threading
 import time
@@ -11,6 +12,7 @@ import uuid
 import subprocess
 import json
 from datetime import datetime, timedelta
+import numpy as np
 
 # ----------------- Argument Parsing -----------------
 parser = argparse.ArgumentParser(description="Flask server for faster-whisper transcription.")
@@ -114,7 +116,52 @@ def get_audio_duration(file_path):
     
     return None
 
+class HashingSpoolFile:
+    """Temporary file that tracks size and sha256 while the multipart parser writes into it"""
+
+    def __init__(self, suffix=''):
+        fd, self.name = tempfile.mkstemp(prefix='whisper_upload_', suffix=suffix)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self._persisted = False
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def persist(self):
+        """Close the file and hand ownership of the path to the caller"""
+        self._file.close()
+        self._persisted = True
+        return self.name
+
+    def close(self):
+        # Called when the request ends; files that were not handed over are removed
+        self._file.close()
+        if not self._persisted and os.path.exists(self.name):
+            os.unlink(self.name)
+
+    def __getattr__(self, name):
+        if name == '_file':
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+
+class SpoolingRequest(Request):
+    """Stream file parts to HashingSpoolFile in bounded chunks instead of buffering them"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpoolFile(suffix=os.path.splitext(filename or '')[1])
+
+
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 CORS(app, origins=["http://localhost:3118", "http://127.0.0.1:3118"])
 
 # 初始化模型 - 改为使用命令行参数
@@ -315,29 +362,26 @@ def transcribe():
             return jsonify({"error": "No file provided"}), 400
         
         file = request.files['file']
-        file_size = len(file.read())
-        file.seek(0)  # Reset file pointer
+        # 上传已在解析时分块写入临时文件，大小和sha256在写入时累计，不再把整个文件读入内存
+        upload = file.stream
+        file_size = upload.size
         
         # 获取语言参数
         language = request.form.get('language', None)
         if language == 'auto' or language == '':
             language = None
         
-        logger.info(f"Processing file: {file.filename}, size: {file_size} bytes ({file_size/(1024*1024):.1f} MB), language: {language or 'auto'}")
+        logger.info(f"Processing file: {file.filename}, size: {file_size} bytes ({file_size/(1024*1024):.1f} MB), sha256: {upload.sha256[:12]}, language: {language or 'auto'}")
         
         if file.filename == '':
             logger.error("Empty filename")
             return jsonify({"error": "No file selected"}), 400
         
-        # 保存临时文件以检查音频时长
-        # 保持原始文件扩展名，避免格式转换问题
-        file_extension = os.path.splitext(file.filename)[1] or '.wav'
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
-        file.save(temp_file.name)
-        temp_file.close()
+        # 直接接管已落盘的上传文件（保持原始扩展名），不再复制一次
+        temp_file_path = upload.persist()
         
         # 获取音频时长
-        duration_seconds = get_audio_duration(temp_file.name)
+        duration_seconds = get_audio_duration(temp_file_path)
         
         # 决定是否使用异步处理
         # 条件：文件大小 > 10MB 或 音频时长 > 10分钟 或 无法获取时长的大文件
@@ -378,7 +422,7 @@ def transcribe():
             # 启动异步处理
             thread = threading.Thread(
                 target=process_audio_async, 
-                args=(task_id, temp_file.name, file.filename, language)
+                args=(task_id, temp_file_path, file.filename, language)
             )
             thread.daemon = True
             thread.start()
@@ -407,13 +451,13 @@ def transcribe():
             # 处理简体中文特殊情况
             if language == "zh-cn":
                 # 对于简体中文，使用中文转录
-                segments, info = model.transcribe(temp_file.name, language="zh")
+                segments, info = model.transcribe(temp_file_path, language="zh")
                 logger.info(f"Transcription completed. Simplified Chinese mode, detected: {info.language}, duration: {info.duration}")
             elif language and language != "auto":
-                segments, info = model.transcribe(temp_file.name, language=language)
+                segments, info = model.transcribe(temp_file_path, language=language)
                 logger.info(f"Transcription completed. Specified language: {language}, detected: {info.language}, duration: {info.duration}")
             else:
-                segments, info = model.transcribe(temp_file.name)
+                segments, info = model.transcribe(temp_file_path)
                 logger.info(f"Transcription completed. Detected language: {info.language}, duration: {info.duration}")
             
             # 格式化结果
@@ -448,26 +492,135 @@ def transcribe():
             logger.info(f"Processed {segment_count} segments, total text length: {len(result['text'])}")
             
             # 清理临时文件
-            os.unlink(temp_file.name)
+            os.unlink(temp_file_path)
             
             return jsonify(result)
     
     except Exception as e:
         logger.error(f"Error during transcription: {str(e)}", exc_info=True)
         # 清理临时文件
-        if 'temp_file' in locals() and os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
+        if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
         return jsonify({"error": str(e)}), 500
 
+# 流式转录参数
+STREAM_SAMPLE_RATE = 16000
+STREAM_WINDOW_SECONDS = 30
+STREAM_PROMPT_CHARS = 200
+
+def start_ffmpeg_pipe(input_stream):
+    """启动ffmpeg管道，后台线程把上传流写入stdin，stdout输出16kHz单声道float32 PCM"""
+    process = subprocess.Popen(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', 'pipe:0',
+         '-f', 'f32le', '-ac', '1', '-ar', str(STREAM_SAMPLE_RATE), 'pipe:1'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+    def feed():
+        try:
+            while True:
+                chunk = input_stream.read(64 * 1024)
+                if not chunk:
+                    break
+                process.stdin.write(chunk)
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    feeder = threading.Thread(target=feed)
+    feeder.daemon = True
+    feeder.start()
+    return process
+
+def iter_stream_windows(process):
+    """从ffmpeg输出中按窗口读取PCM，最后一个窗口可能不足窗口长度"""
+    window_bytes = STREAM_WINDOW_SECONDS * STREAM_SAMPLE_RATE * 4
+    while True:
+        data = process.stdout.read(window_bytes)
+        if not data:
+            break
+        data = data[:len(data) - len(data) % 4]
+        yield np.frombuffer(data, dtype=np.float32)
+    process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {process.stderr.read().decode('utf-8', errors='replace').strip()}")
+
 @app.route('/stream', methods=['POST'])
 def stream_transcribe():
-    """流式处理音频 - 这是一个占位符，Whisper.cpp支持但faster-whisper默认不支持"""
-    # faster-whisper本身不支持流式解码，此功能需要额外实现
-    # 这里返回一个兼容的错误或空实现
-    return jsonify({
-        "error": "Streaming not implemented in this Python server.",
-        "message": "This endpoint is a placeholder for Whisper.cpp compatibility."
-    }), 501
+    """流式转录 - 边接收分块上传的音频边解码，以NDJSON逐行返回片段"""
+    language = request.args.get('language', None)
+    if language == 'auto' or language == '':
+        language = None
+    transcribe_language = "zh" if language == "zh-cn" else language
+    process = start_ffmpeg_pipe(request.stream)
+    logger.info(f"Streaming transcription started, language: {language or 'auto'}")
+
+    def generate():
+        buffer = np.zeros(0, dtype=np.float32)
+        offset = 0.0
+        committed_text = ""
+        detected_language = transcribe_language
+        segment_count = 0
+        try:
+            yield json.dumps({"type": "started"}) + "\n"
+            windows = iter_stream_windows(process)
+            window_samples = STREAM_WINDOW_SECONDS * STREAM_SAMPLE_RATE
+            exhausted = False
+            while True:
+                # 缓冲不足一个窗口时才读取下一窗口：每轮只消费到最后一个完整片段，
+                # 无条件追加会让缓冲（内存和输出延迟）随流长度不断增长
+                while len(buffer) < window_samples and not exhausted:
+                    audio = next(windows, None)
+                    if audio is None:
+                        exhausted = True
+                    else:
+                        buffer = np.concatenate([buffer, audio])
+                if not len(buffer):
+                    break
+                # 窗口末尾的片段可能被截断，除非已是最后的音频，否则留到下一窗口
+                decode_audio = buffer[:window_samples]
+                final = exhausted and len(buffer) <= window_samples
+                options = {"initial_prompt": committed_text[-STREAM_PROMPT_CHARS:]} if committed_text else {}
+                segments, info = model.transcribe(decode_audio, language=detected_language, **options)
+                segments = list(segments)
+                detected_language = detected_language or info.language
+                keep = segments if final or len(segments) <= 1 else segments[:-1]
+                consumed = len(decode_audio) if keep is segments else int(keep[-1].end * STREAM_SAMPLE_RATE)
+                for segment in keep:
+                    segment_text = segment.text.strip()
+                    if language == "zh-cn":
+                        segment_text = convert_to_simplified_chinese(segment_text)
+                    committed_text += segment_text
+                    yield json.dumps({
+                        "type": "segment",
+                        "index": segment_count,
+                        "start": segment.start + offset,
+                        "end": segment.end + offset,
+                        "text": segment_text,
+                        "t0": segment.start + offset,
+                        "t1": segment.end + offset
+                    }, ensure_ascii=False) + "\n"
+                    segment_count += 1
+                consumed = max(1, min(consumed, len(decode_audio)))
+                buffer = buffer[consumed:]
+                offset += consumed / STREAM_SAMPLE_RATE
+                if final:
+                    break
+            yield json.dumps({"type": "done", "language": detected_language, "segments": segment_count}) + "\n"
+            logger.info(f"Streaming transcription finished with {segment_count} segments")
+        except Exception as e:
+            logger.error(f"Error during streaming transcription: {str(e)}", exc_info=True)
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
 
 if __name__ == '__main__':
     logger.info(f"Starting server on http://127.0.0.1:{args.port}")